@@ -1,22 +1,47 @@
 # filepath: data_ops.py
 """Handle null/optional fields in LanceDB."""
 
-from typing import Optional
+import hashlib
+from collections import defaultdict
+from typing import Dict, Optional
 import lancedb
 from lancedb.pydantic import LanceModel, Vector
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 
 # Define schema with optional fields
 class Document(LanceModel):
     """Document schema with optional fields."""
     text: str
+    text_hash: int
     vector: Vector(384)
     category: Optional[str] = None
     tags: Optional[str] = None
 
 
+# Staging schema used to validate incoming records column-wise; missing
+# optional keys become nulls and vectors keep their original length
+_STAGING_SCHEMA = pa.schema([
+    pa.field("text", pa.string()),
+    pa.field("vector", pa.list_(pa.float32())),
+    pa.field("category", pa.string()),
+    pa.field("tags", pa.string()),
+])
+
+
+def text_hash(text: str) -> int:
+    """Compute a stable signed 64-bit hash of a document's text.
+    
+    Stored alongside the text so update filters can probe a scalar index on
+    ``text_hash`` instead of scanning the full ``text`` column.
+    """
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
 def insert_with_nulls(table, data):
     """Insert data with optional null fields.
     
@@ -36,25 +61,34 @@ def insert_with_nulls(table, data):
         if isinstance(data, pd.DataFrame):
             data = data.to_dict('records')
         
-        # Validate that required fields are present
-        for idx, record in enumerate(data):
-            if 'text' not in record or record['text'] is None:
-                raise ValueError(f"Record {idx}: 'text' is a required field and cannot be null")
-            if 'vector' not in record or record['vector'] is None:
-                raise ValueError(f"Record {idx}: 'vector' is a required field and cannot be null")
-            
-            # Ensure vector has correct dimensions
-            if len(record['vector']) != 384:
-                raise ValueError(f"Record {idx}: vector must have 384 dimensions, got {len(record['vector'])}")
-            
-            # Handle missing optional fields by setting them to None explicitly
-            if 'category' not in record:
-                record['category'] = None
-            if 'tags' not in record:
-                record['tags'] = None
+        # Build a columnar view once and validate with Arrow kernels
+        staged = pa.Table.from_pylist(data, schema=_STAGING_SCHEMA)
+        
+        for field in ("text", "vector"):
+            missing = pc.is_null(staged[field])
+            if pc.any(missing).as_py():
+                idx = int(np.flatnonzero(missing.to_numpy(zero_copy_only=False))[0])
+                raise ValueError(f"Record {idx}: '{field}' is a required field and cannot be null")
+        
+        # Ensure vectors have correct dimensions
+        lengths = pc.list_value_length(staged["vector"]).to_numpy()
+        bad = np.flatnonzero(lengths != 384)
+        if bad.size:
+            idx = int(bad[0])
+            raise ValueError(f"Record {idx}: vector must have 384 dimensions, got {lengths[idx]}")
+        
+        vectors = staged["vector"].combine_chunks()
+        hashes = pa.array([text_hash(text) for text in staged["text"].to_pylist()], pa.int64())
+        batch = pa.table({
+            "text": staged["text"],
+            "text_hash": hashes,
+            "vector": pa.FixedSizeListArray.from_arrays(vectors.flatten(), 384),
+            "category": staged["category"],
+            "tags": staged["tags"],
+        })
         
         # Insert data into table
-        table.add(data)
+        table.add(batch)
         print(f"Successfully inserted {len(data)} records with null/optional fields")
         
     except ValueError as ve:
@@ -94,6 +128,11 @@ def query_with_null_filters(table, category_filter: Optional[str] = None):
         raise
 
 
+def _sql_literal(value: str) -> str:
+    """Quote a string as a SQL literal, escaping embedded single quotes."""
+    return "'" + value.replace("'", "''") + "'"
+
+
 def update_null_fields(table, text_filter: str, new_category: str):
     """Update null fields in existing records.
     
@@ -102,16 +141,41 @@ def update_null_fields(table, text_filter: str, new_category: str):
         text_filter: Text to filter records by
         new_category: New category value to set
         
+    Returns:
+        None
+    """
+    update_null_fields_batch(table, {text_filter: new_category})
+
+
+def update_null_fields_batch(table, updates: Dict[str, str]):
+    """Update the category of many records with one update per category.
+    
+    Texts sharing the same new category are grouped into a single
+    ``text IN (...)`` predicate, so the update is planned once per group
+    instead of once per record.
+    
+    Args:
+        table: LanceDB table instance
+        updates: Mapping of text filter to new category value
+        
     Returns:
         None
     """
     try:
-        # Update records where category is null
-        table.update(
-            where=f"text = '{text_filter}'",
-            values={"category": new_category}
-        )
-        print(f"Updated records matching '{text_filter}' with category '{new_category}'")
+        # Group texts by their target category
+        groups = defaultdict(list)
+        for text_filter, new_category in updates.items():
+            groups[new_category].append(text_filter)
+        
+        for new_category, texts in groups.items():
+            # Probe by hash first; the text match guards against collisions
+            hashes = ", ".join(str(text_hash(text)) for text in texts)
+            literals = ", ".join(_sql_literal(text) for text in texts)
+            table.update(
+                where=f"text_hash IN ({hashes}) AND text IN ({literals})",
+                values={"category": new_category}
+            )
+            print(f"Updated {len(texts)} text filter(s) with category '{new_category}'")
         
     except Exception as e:
         print(f"Error updating null fields: {e}")
@@ -129,30 +193,30 @@ def main():
         data = [
             {
                 "text": "Document with all fields",
-                "vector": np.random.randn(384).astype(np.float32).tolist(),
+                "vector": np.random.randn(384).astype(np.float32),
                 "category": "technology",
                 "tags": "ai,ml,python"
             },
             {
                 "text": "Document with null category",
-                "vector": np.random.randn(384).astype(np.float32).tolist(),
+                "vector": np.random.randn(384).astype(np.float32),
                 "category": None,
                 "tags": "research,paper"
             },
             {
                 "text": "Document with null tags",
-                "vector": np.random.randn(384).astype(np.float32).tolist(),
+                "vector": np.random.randn(384).astype(np.float32),
                 "category": "science",
                 "tags": None
             },
             {
                 "text": "Document with both nulls",
-                "vector": np.random.randn(384).astype(np.float32).tolist(),
+                "vector": np.random.randn(384).astype(np.float32),
                 # category and tags will be set to None by insert_with_nulls
             },
             {
                 "text": "Another complete document",
-                "vector": np.random.randn(384).astype(np.float32).tolist(),
+                "vector": np.random.randn(384).astype(np.float32),
                 "category": "business",
                 "tags": "finance,economics"
             }
@@ -161,20 +225,18 @@ def main():
         # Create table with schema
         table_name = "documents_with_nulls"
         
-        # Drop table if it exists (for clean demo)
-        try:
-            db.drop_table(table_name)
-        except:
-            pass
-        
-        # Create table with schema
-        table = db.create_table(table_name, schema=Document)
+        # Create table with schema, overwriting any previous demo run in a
+        # single commit rather than a drop followed by a create
+        table = db.create_table(table_name, schema=Document, mode="overwrite")
         print(f"Created table '{table_name}' with schema")
         
         # Insert data with null fields
         print("\n--- Inserting data with null fields ---")
         insert_with_nulls(table, data)
         
+        # Index the text hash so updates by text avoid a full column scan
+        table.create_scalar_index("text_hash", replace=True)
+        
         # Verify insertion
         print("\n--- Verifying all records ---")
         all_records = table.to_pandas()
@@ -207,7 +269,7 @@ def main():
         try:
             invalid_data = [
                 {
-                    "vector": np.random.randn(384).astype(np.float32).tolist(),
+                    "vector": np.random.randn(384).astype(np.float32),
                     # Missing required 'text' field
                 }
             ]
@@ -220,7 +282,7 @@ def main():
             invalid_vector_data = [
                 {
                     "text": "Invalid vector dimensions",
-                    "vector": np.random.randn(128).astype(np.float32).tolist(),  # Wrong size
+                    "vector": np.random.randn(128).astype(np.float32),  # Wrong size
                 }
             ]
             insert_with_nulls(table, invalid_vector_data)
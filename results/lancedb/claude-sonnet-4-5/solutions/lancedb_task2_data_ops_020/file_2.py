@@ -41,7 +41,8 @@ def validate_vector(vector, expected_dim: int) -> bool:
         return False
 
 
-def safe_insert(table, data: List[Dict[str, Any]], vector_dim: int, vector_column: str = "vector") -> Dict[str, Any]:
+def safe_insert(table, data: List[Dict[str, Any]], vector_dim: int, vector_column: str = "vector",
+                collect_details: bool = False) -> Dict[str, Any]:
     """Insert data with vector validation.
     
     Args:
@@ -49,6 +50,9 @@ def safe_insert(table, data: List[Dict[str, Any]], vector_dim: int, vector_colum
         data: List of dictionaries containing records to insert
         vector_dim: Expected dimension of vectors
         vector_column: Name of the vector column (default: "vector")
+        collect_details: If True, include per-record "fixed_details" and
+            "invalid_details" lists in the result; otherwise only counts
+            are kept and rejected records are not retained
         
     Returns:
         Dictionary with statistics about the insertion
@@ -56,16 +60,20 @@ def safe_insert(table, data: List[Dict[str, Any]], vector_dim: int, vector_colum
     valid_records = []
     invalid_records = []
     fixed_records = []
+    fixed_count = 0
+    invalid_count = 0
     
     for idx, record in enumerate(data):
         try:
             # Check if vector column exists
             if vector_column not in record:
-                invalid_records.append({
-                    "index": idx,
-                    "reason": f"Missing '{vector_column}' column",
-                    "record": record
-                })
+                invalid_count += 1
+                if collect_details:
+                    invalid_records.append({
+                        "index": idx,
+                        "reason": f"Missing '{vector_column}' column",
+                        "record": record
+                    })
                 continue
             
             vector = record[vector_column]
@@ -84,59 +92,71 @@ def safe_insert(table, data: List[Dict[str, Any]], vector_dim: int, vector_colum
                     
                     # Handle dimension mismatch
                     if len(vec_array) < vector_dim:
-                        # Pad with zeros
-                        vec_array = np.pad(vec_array, (0, vector_dim - len(vec_array)), 
-                                          mode='constant', constant_values=0)
+                        # Pad with zeros by copying into a zeroed buffer
+                        padded = np.zeros(vector_dim, dtype=np.float32)
+                        padded[:vec_array.size] = vec_array
                         fixed_record = record.copy()
-                        fixed_record[vector_column] = vec_array.tolist()
+                        fixed_record[vector_column] = padded
                         valid_records.append(fixed_record)
-                        fixed_records.append({
-                            "index": idx,
-                            "action": "padded",
-                            "original_dim": len(vector),
-                            "new_dim": vector_dim
-                        })
+                        fixed_count += 1
+                        if collect_details:
+                            fixed_records.append({
+                                "index": idx,
+                                "action": "padded",
+                                "original_dim": len(vector),
+                                "new_dim": vector_dim
+                            })
                     elif len(vec_array) > vector_dim:
                         # Truncate
                         vec_array = vec_array[:vector_dim]
                         fixed_record = record.copy()
-                        fixed_record[vector_column] = vec_array.tolist()
+                        fixed_record[vector_column] = vec_array
                         valid_records.append(fixed_record)
-                        fixed_records.append({
-                            "index": idx,
-                            "action": "truncated",
-                            "original_dim": len(vector),
-                            "new_dim": vector_dim
-                        })
+                        fixed_count += 1
+                        if collect_details:
+                            fixed_records.append({
+                                "index": idx,
+                                "action": "truncated",
+                                "original_dim": len(vector),
+                                "new_dim": vector_dim
+                            })
                     else:
                         # Replace NaN/inf with zeros
                         if not np.all(np.isfinite(vec_array)):
                             vec_array = np.nan_to_num(vec_array, nan=0.0, posinf=0.0, neginf=0.0)
                             fixed_record = record.copy()
-                            fixed_record[vector_column] = vec_array.tolist()
+                            fixed_record[vector_column] = vec_array
                             valid_records.append(fixed_record)
-                            fixed_records.append({
-                                "index": idx,
-                                "action": "replaced_invalid_values"
-                            })
+                            fixed_count += 1
+                            if collect_details:
+                                fixed_records.append({
+                                    "index": idx,
+                                    "action": "replaced_invalid_values"
+                                })
                         else:
-                            invalid_records.append({
-                                "index": idx,
-                                "reason": "Unknown validation failure",
-                                "record": record
-                            })
+                            invalid_count += 1
+                            if collect_details:
+                                invalid_records.append({
+                                    "index": idx,
+                                    "reason": "Unknown validation failure",
+                                    "record": record
+                                })
                 except Exception as e:
-                    invalid_records.append({
-                        "index": idx,
-                        "reason": f"Failed to fix: {str(e)}",
-                        "record": record
-                    })
+                    invalid_count += 1
+                    if collect_details:
+                        invalid_records.append({
+                            "index": idx,
+                            "reason": f"Failed to fix: {str(e)}",
+                            "record": record
+                        })
         except Exception as e:
-            invalid_records.append({
-                "index": idx,
-                "reason": f"Processing error: {str(e)}",
-                "record": record
-            })
+            invalid_count += 1
+            if collect_details:
+                invalid_records.append({
+                    "index": idx,
+                    "reason": f"Processing error: {str(e)}",
+                    "record": record
+                })
     
     # Insert valid records
     inserted_count = 0
@@ -151,11 +171,12 @@ def safe_insert(table, data: List[Dict[str, Any]], vector_dim: int, vector_colum
     stats = {
         "total_records": len(data),
         "inserted": inserted_count,
-        "fixed": len(fixed_records),
-        "invalid": len(invalid_records),
-        "fixed_details": fixed_records,
-        "invalid_details": invalid_records
+        "fixed": fixed_count,
+        "invalid": invalid_count
     }
+    if collect_details:
+        stats["fixed_details"] = fixed_records
+        stats["invalid_details"] = invalid_records
     
     return stats
 
@@ -178,14 +199,8 @@ def main():
     
     # Create table with schema
     try:
-        # Drop table if exists
-        try:
-            db.drop_table("test_vectors")
-        except:
-            pass
-        
-        # Create new table
-        table = db.create_table("test_vectors", schema=schema)
+        # Create new table, overwriting any previous run in a single commit
+        table = db.create_table("test_vectors", schema=schema, mode="overwrite")
         print(f"Created table with vector dimension: {VECTOR_DIM}")
     except Exception as e:
         print(f"Error creating table: {e}")
@@ -197,19 +212,19 @@ def main():
         {
             "id": 1,
             "text": "Valid vector",
-            "vector": np.random.randn(VECTOR_DIM).tolist()
+            "vector": np.random.randn(VECTOR_DIM).astype(np.float32)
         },
         # Vector too short
         {
             "id": 2,
             "text": "Short vector",
-            "vector": np.random.randn(64).tolist()
+            "vector": np.random.randn(64).astype(np.float32)
         },
         # Vector too long
         {
             "id": 3,
             "text": "Long vector",
-            "vector": np.random.randn(256).tolist()
+            "vector": np.random.randn(256).astype(np.float32)
         },
         # Vector with NaN
         {
@@ -238,20 +253,20 @@ def main():
         {
             "id": 8,
             "text": "2D array",
-            "vector": np.random.randn(8, 16).tolist()
+            "vector": np.random.randn(8, 16).astype(np.float32)
         },
         # Another valid vector
         {
             "id": 9,
             "text": "Another valid vector",
-            "vector": np.random.randn(VECTOR_DIM).tolist()
+            "vector": np.random.randn(VECTOR_DIM).astype(np.float32)
         }
     ]
     
     print(f"\nAttempting to insert {len(test_data)} records...")
     
     # Safely insert data
-    stats = safe_insert(table, test_data, VECTOR_DIM)
+    stats = safe_insert(table, test_data, VECTOR_DIM, collect_details=True)
     
     # Print statistics
     print("\n=== Insertion Statistics ===")
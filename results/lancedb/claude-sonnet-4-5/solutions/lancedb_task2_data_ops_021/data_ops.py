@@ -1,104 +1,144 @@
 # filepath: data_ops.py
 """Handle token limits with chunking."""
 
-import re
+import hashlib
+from functools import lru_cache
 import lancedb
+import numpy as np
+import pyarrow as pa
 import tiktoken
-import pandas as pd
-from typing import List, Dict, Any
+import torch
+from typing import List, Dict, Any, Optional
 from sentence_transformers import SentenceTransformer
 
 MAX_TOKENS = 8192
 
-def count_tokens(text: str, model: str = "cl100k_base") -> int:
+# Above this many chunks, CPU-only embedding is sharded across worker processes
+MULTI_PROCESS_MIN_CHUNKS = 1000
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(name: str) -> tiktoken.Encoding:
+    """Load a tiktoken encoding once and reuse it across calls."""
+    return tiktoken.get_encoding(name)
+
+
+@lru_cache(maxsize=4)
+def _get_st_model(name: str) -> SentenceTransformer:
+    """Load a sentence transformer once and reuse it across calls."""
+    return SentenceTransformer(name)
+
+
+@lru_cache(maxsize=8)
+def _sentence_end_tokens(encoding: tiktoken.Encoding) -> frozenset:
+    """Token ids of the terminal punctuation marks for an encoding."""
+    return frozenset(token for mark in ".!?" for token in encoding.encode_ordinary(mark))
+
+
+def _starts_mid_character(encoding: tiktoken.Encoding, token: int) -> bool:
+    """Whether a token's bytes begin with a UTF-8 continuation byte."""
+    return encoding.decode_single_token_bytes(token)[0] & 0xC0 == 0x80
+
+
+def _chunk_token_ids(token_ids: List[int], max_tokens: int,
+                     encoding: tiktoken.Encoding) -> List[List[int]]:
+    """Split a token sequence into windows of at most max_tokens.
+    
+    Each window is cut just after the last sentence-ending token in its
+    second half when there is one, so chunks tend to end on a sentence.
+    A cut never falls inside a multi-byte character whose bytes span
+    several tokens, so every window decodes on its own without U+FFFD.
+    """
+    sentence_ends = _sentence_end_tokens(encoding)
+    windows = []
+    start = 0
+    
+    while start < len(token_ids):
+        end = min(start + max_tokens, len(token_ids))
+        if end < len(token_ids):
+            for pos in range(end - 1, start + max_tokens // 2 - 1, -1):
+                if token_ids[pos] in sentence_ends:
+                    end = pos + 1
+                    break
+            # Back off while the next token continues a UTF-8 sequence
+            while end - 1 > start and _starts_mid_character(encoding, token_ids[end]):
+                end -= 1
+        windows.append(token_ids[start:end])
+        start = end
+    
+    return windows
+
+
+def _count_tokens(encoding: tiktoken.Encoding, text: str) -> int:
+    """Count tokens in text with an already-loaded encoding."""
+    return len(encoding.encode_ordinary(text))
+
+
+def count_tokens(text: str, model: str = "cl100k_base",
+                 encoding: Optional[tiktoken.Encoding] = None) -> int:
     """Count tokens in text.
     
     Args:
         text: Input text to count tokens
         model: Tiktoken encoding model name
+        encoding: Preloaded encoding to use instead of looking up ``model``
         
     Returns:
         Number of tokens in the text
     """
     try:
-        encoding = tiktoken.get_encoding(model)
-        tokens = encoding.encode(text)
-        return len(tokens)
+        return _count_tokens(encoding or _get_encoding(model), text)
     except Exception as e:
         print(f"Error counting tokens: {e}")
         # Fallback to rough estimation (1 token ≈ 4 chars)
         return len(text) // 4
 
 
-def chunk_text(text: str, max_tokens: int = MAX_TOKENS, model: str = "cl100k_base") -> List[str]:
+def chunk_text(text: str, max_tokens: int = MAX_TOKENS, model: str = "cl100k_base",
+               encoding: Optional[tiktoken.Encoding] = None) -> List[str]:
     """Chunk text to fit token limit.
     
     Args:
         text: Input text to chunk
         max_tokens: Maximum tokens per chunk
         model: Tiktoken encoding model name
+        encoding: Preloaded encoding to use instead of looking up ``model``
         
     Returns:
         List of text chunks, each under max_tokens
     """
-    # Split text into sentences using regex
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
+    # Tokenize once and slice the token ids into windows
+    encoding = encoding or _get_encoding(model)
+    windows = _chunk_token_ids(encoding.encode_ordinary(text), max_tokens, encoding)
     
-    encoding = tiktoken.get_encoding(model)
+    return [encoding.decode(window) for window in windows]
+
+
+def _embed_chunks(model: SentenceTransformer, texts: List[str], batch_size: int = 64) -> np.ndarray:
+    """Embed chunk texts, using a multi-process pool for large CPU-only jobs.
     
-    for sentence in sentences:
-        # Count tokens in the sentence
-        sentence_tokens = len(encoding.encode(sentence))
-        
-        # If single sentence exceeds max_tokens, split it further
-        if sentence_tokens > max_tokens:
-            # If we have accumulated content, save it first
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = []
-                current_tokens = 0
-            
-            # Split long sentence by words
-            words = sentence.split()
-            word_chunk = []
-            word_tokens = 0
-            
-            for word in words:
-                word_token_count = len(encoding.encode(word + ' '))
-                
-                if word_tokens + word_token_count > max_tokens:
-                    if word_chunk:
-                        chunks.append(' '.join(word_chunk))
-                    word_chunk = [word]
-                    word_tokens = word_token_count
-                else:
-                    word_chunk.append(word)
-                    word_tokens += word_token_count
-            
-            if word_chunk:
-                chunks.append(' '.join(word_chunk))
-            continue
+    Args:
+        model: Loaded sentence transformer
+        texts: Chunk texts to embed
+        batch_size: Number of texts per forward pass
         
-        # Check if adding this sentence would exceed the limit
-        if current_tokens + sentence_tokens > max_tokens:
-            # Save current chunk and start new one
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
-            current_chunk = [sentence]
-            current_tokens = sentence_tokens
-        else:
-            current_chunk.append(sentence)
-            current_tokens += sentence_tokens
-    
-    # Add remaining chunk
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    return chunks
+    Returns:
+        float32 array of shape (len(texts), dim)
+    """
+    if len(texts) > MULTI_PROCESS_MIN_CHUNKS and not torch.cuda.is_available():
+        pool = model.start_multi_process_pool()
+        try:
+            embeddings = model.encode_multi_process(texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        embeddings = model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+    return np.asarray(embeddings, dtype=np.float32)
 
 
 def ingest_with_chunking(
@@ -121,57 +161,114 @@ def ingest_with_chunking(
         LanceDB table object
     """
     try:
-        # Initialize embedding model
-        model = SentenceTransformer(embedding_model)
+        # Get the (cached) embedding model
+        model = _get_st_model(embedding_model)
+        
+        # Load the tokenizer once for the whole ingest
+        encoding = _get_encoding("cl100k_base")
         
-        # Process documents and create chunks
-        chunked_data = []
+        # Collect metadata keys across all documents so every column is aligned
+        metadata_keys = list(dict.fromkeys(
+            key for doc in documents for key in doc if key != 'text'
+        ))
         
-        for doc_idx, doc in enumerate(documents):
-            text = doc.get('text', '')
-            metadata = {k: v for k, v in doc.items() if k != 'text'}
+        # Every BPE token covers at least one UTF-8 byte, so a document with
+        # no more bytes than max_tokens fits without an exact check; their
+        # token counts are taken in one batched call
+        doc_texts = [doc.get('text', '') for doc in documents]
+        short_docs = [
+            doc_idx for doc_idx, text in enumerate(doc_texts)
+            if len(text.encode('utf-8')) <= max_tokens
+        ]
+        short_counts = dict(zip(
+            short_docs,
+            map(len, encoding.encode_ordinary_batch([doc_texts[i] for i in short_docs]))
+        ))
+        
+        # Pass 1: chunk every document
+        doc_chunks = []
+        for doc_idx, text in enumerate(doc_texts):
+            if doc_idx in short_counts:
+                doc_chunks.append(([text], [short_counts[doc_idx]]))
+                continue
             
-            # Count tokens
-            token_count = count_tokens(text)
+            # Tokenize once; chunk token counts come from the windows
+            token_ids = encoding.encode_ordinary(text)
             
-            if token_count <= max_tokens:
+            if len(token_ids) <= max_tokens:
                 # Document fits in one chunk
                 chunks = [text]
+                chunk_token_counts = [len(token_ids)]
             else:
                 # Chunk the document
-                chunks = chunk_text(text, max_tokens)
+                windows = _chunk_token_ids(token_ids, max_tokens, encoding)
+                chunks = [encoding.decode(window) for window in windows]
+                chunk_token_counts = [len(window) for window in windows]
                 print(f"Document {doc_idx} split into {len(chunks)} chunks")
             
-            # Create entries for each chunk
-            for chunk_idx, chunk in enumerate(chunks):
-                # Generate embedding
-                embedding = model.encode(chunk).tolist()
-                
-                entry = {
-                    'text': chunk,
-                    'vector': embedding,
-                    'doc_id': doc_idx,
-                    'chunk_id': chunk_idx,
-                    'total_chunks': len(chunks),
-                    'token_count': count_tokens(chunk),
-                    **metadata
-                }
-                chunked_data.append(entry)
+            doc_chunks.append((chunks, chunk_token_counts))
+        
+        # Pass 2: fill pre-sized column buffers
+        num_rows = sum(len(chunks) for chunks, _ in doc_chunks)
+        texts = [None] * num_rows
+        doc_ids = np.empty(num_rows, dtype=np.int64)
+        chunk_ids = np.empty(num_rows, dtype=np.int64)
+        total_chunks = np.empty(num_rows, dtype=np.int64)
+        token_counts = np.empty(num_rows, dtype=np.int64)
         
-        # Convert to DataFrame
-        df = pd.DataFrame(chunked_data)
+        start = 0
+        for doc_idx, (chunks, chunk_token_counts) in enumerate(doc_chunks):
+            end = start + len(chunks)
+            texts[start:end] = chunks
+            doc_ids[start:end] = doc_idx
+            chunk_ids[start:end] = np.arange(len(chunks))
+            total_chunks[start:end] = len(chunks)
+            token_counts[start:end] = chunk_token_counts
+            start = end
+        
+        # Embed each distinct chunk once; duplicates reuse the same row
+        unique_index = {}
+        unique_texts = []
+        inverse = np.empty(len(texts), dtype=np.intp)
+        for i, chunk in enumerate(texts):
+            digest = hashlib.blake2b(chunk.encode('utf-8'), digest_size=16).digest()
+            j = unique_index.get(digest)
+            if j is None:
+                j = unique_index[digest] = len(unique_texts)
+                unique_texts.append(chunk)
+            inverse[i] = j
+        
+        # Generate embeddings in one batched (or pooled) pass
+        embeddings = _embed_chunks(model, unique_texts)[inverse]
+        
+        # Wrap the contiguous float32 matrix as a fixed-size list column
+        vectors = pa.FixedSizeListArray.from_arrays(
+            pa.array(embeddings.reshape(-1)), embeddings.shape[1]
+        )
+        columns = {
+            'text': pa.array(texts, type=pa.string()),
+            'vector': vectors,
+            'doc_id': pa.array(doc_ids),
+            'chunk_id': pa.array(chunk_ids),
+            'total_chunks': pa.array(total_chunks),
+            'token_count': pa.array(token_counts),
+        }
+        # Metadata is per document, so gather it to chunk rows by doc_id
+        for key in metadata_keys:
+            columns[key] = pa.array([doc.get(key) for doc in documents]).take(columns['doc_id'])
+        data = pa.table(columns)
         
         # Create or append to table
         try:
             # Try to open existing table
             table = db.open_table(table_name)
             # Append data
-            table.add(df)
-            print(f"Appended {len(chunked_data)} chunks to existing table '{table_name}'")
+            table.add(data)
+            print(f"Appended {data.num_rows} chunks to existing table '{table_name}'")
         except Exception:
             # Table doesn't exist, create new one
-            table = db.create_table(table_name, df)
-            print(f"Created table '{table_name}' with {len(chunked_data)} chunks")
+            table = db.create_table(table_name, data)
+            print(f"Created table '{table_name}' with {data.num_rows} chunks")
         
         return table
         
@@ -223,8 +320,9 @@ def main():
         
         # Check token counts
         print("Token counts before chunking:")
+        encoding = _get_encoding("cl100k_base")
         for idx, doc in enumerate(documents):
-            tokens = count_tokens(doc['text'])
+            tokens = _count_tokens(encoding, doc['text'])
             print(f"  Document {idx}: {tokens} tokens")
         
         # Ingest with automatic chunking
@@ -235,27 +333,34 @@ def main():
             max_tokens=500  # Use smaller limit for demonstration
         )
         
-        # Verify ingestion
-        result_df = table.to_pandas()
-        print(f"\nTotal chunks in table: {len(result_df)}")
-        print(f"Columns: {result_df.columns.tolist()}")
+        # Verify ingestion, reading only the scalar columns we report on
+        print(f"\nTotal chunks in table: {table.count_rows()}")
+        print(f"Columns: {table.schema.names}")
         
         # Show chunk distribution
         print("\nChunk distribution by document:")
-        for doc_id in result_df['doc_id'].unique():
-            doc_chunks = result_df[result_df['doc_id'] == doc_id]
-            print(f"  Document {doc_id}: {len(doc_chunks)} chunks")
-            print(f"    Token range: {doc_chunks['token_count'].min()}-{doc_chunks['token_count'].max()}")
+        stats = (
+            table.search()
+            .select(['doc_id', 'token_count'])
+            .limit(None)
+            .to_arrow()
+            .group_by('doc_id')
+            .aggregate([('token_count', 'count'), ('token_count', 'min'), ('token_count', 'max')])
+            .sort_by('doc_id')
+        )
+        for row in stats.to_pylist():
+            print(f"  Document {row['doc_id']}: {row['token_count_count']} chunks")
+            print(f"    Token range: {row['token_count_min']}-{row['token_count_max']}")
         
         # Test search on chunked data
         print("\nTesting search on chunked data...")
         query = "What is artificial intelligence?"
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        query_vector = model.encode(query).tolist()
+        model = _get_st_model("all-MiniLM-L6-v2")
+        query_vector = model.encode(query)
         
-        search_results = table.search(query_vector).limit(3).to_pandas()
+        search_results = table.search(query_vector).limit(3).to_list()
         print(f"Top 3 search results:")
-        for idx, row in search_results.iterrows():
+        for idx, row in enumerate(search_results):
             print(f"  {idx + 1}. Doc {row['doc_id']}, Chunk {row['chunk_id']}: {row['text'][:100]}...")
         
         print("\nToken-aware ingestion complete!")
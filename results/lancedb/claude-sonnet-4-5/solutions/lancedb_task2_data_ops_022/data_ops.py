@@ -1,55 +1,104 @@
 # filepath: data_ops.py
 """Batch ingestion with progress tracking."""
 
+import lance
 import lancedb
 import numpy as np
-import pandas as pd
+import pyarrow as pa
 from tqdm import tqdm
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
 
-BATCH_SIZE = 100
+BATCH_SIZE = 10_000
+MAX_ROWS_PER_FILE = 1024 * 1024
 
-def batch_ingest(db, table_name: str, documents: list, batch_size: int = BATCH_SIZE):
+def _infer_schema(documents: List[Dict[str, Any]]) -> pa.Schema:
+    """Infer an Arrow schema from all documents.
+
+    Every key seen in any document becomes a column, and each column's type
+    is inferred from all of its values, so a None or a missing key in one
+    document does not decide the type. The vector column is typed as a
+    fixed-size list of float32 so every batch is written with the layout
+    LanceDB expects for vector search.
+    """
+    names = list(dict.fromkeys(key for doc in documents for key in doc))
+    fields = []
+    for name in names:
+        if name == "vector":
+            vector_type = pa.list_(pa.float32(), len(documents[0]["vector"]))
+            fields.append(pa.field("vector", vector_type))
+        else:
+            fields.append(pa.field(name, pa.array([doc.get(name) for doc in documents]).type))
+    return pa.schema(fields)
+
+def _batch_to_arrow(batch: List[Dict[str, Any]], schema: pa.Schema) -> pa.RecordBatch:
+    """Convert a slice of documents to a record batch, one column at a time.
+
+    Vectors are stacked into a single float32 buffer and wrapped as a
+    fixed-size list array rather than converted element by element.
+    """
+    arrays = []
+    for field in schema:
+        if field.name == "vector":
+            matrix = np.asarray([doc["vector"] for doc in batch], dtype=np.float32)
+            arrays.append(pa.FixedSizeListArray.from_arrays(
+                pa.array(matrix.reshape(-1)), field.type.list_size
+            ))
+        else:
+            arrays.append(pa.array([doc.get(field.name) for doc in batch], type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def batch_ingest(db, table_name: str, documents: Union[List[Dict[str, Any]], pa.Table],
+                 batch_size: int = BATCH_SIZE):
     """Ingest documents in batches with progress.
 
+    Batches are streamed through a single RecordBatchReader straight into
+    the table's Lance dataset, so the whole ingest is one write commit
+    instead of a create followed by one ``add`` per batch. Requires a local
+    (filesystem or object store) connection.
+
     Args:
         db: LanceDB connection
         table_name: Name of the table to create/update
-        documents: List of document dictionaries with 'id', 'text', and 'vector' keys
+        documents: List of document dictionaries with 'id', 'text', and 'vector'
+            keys, or a pyarrow Table with those columns
         batch_size: Number of documents per batch
 
     Returns:
         The created/updated table
     """
-    if not documents:
+    if not len(documents):
         raise ValueError("Documents list cannot be empty")
     
-    # Split documents into batches
-    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    if isinstance(documents, pa.Table):
+        # Columnar input already carries its schema; slice it without copying
+        schema = documents.schema
+        batches = documents.to_batches(max_chunksize=batch_size)
+    else:
+        # Build the schema once, from every document
+        schema = _infer_schema(documents)
+        batches = (
+            _batch_to_arrow(documents[start:start + batch_size], schema)
+            for start in range(0, len(documents), batch_size)
+        )
+    num_batches = (len(documents) + batch_size - 1) // batch_size
     
-    table = None
+    def record_batches():
+        yield from tqdm(batches, total=num_batches, desc="Ingesting batches", unit="batch")
     
     try:
-        # Create table with first batch
-        first_batch = batches[0]
-        print(f"Creating table '{table_name}' with {len(first_batch)} documents...")
-        
-        # Convert first batch to pandas DataFrame
-        df_first = pd.DataFrame(first_batch)
-        
-        # Create the table
-        table = db.create_table(table_name, data=df_first, mode="overwrite")
-        print(f"Table created successfully with {len(first_batch)} documents")
-        
-        # Add remaining batches with progress bar
-        if len(batches) > 1:
-            print(f"\nAdding remaining {len(batches) - 1} batches...")
-            
-            for batch in tqdm(batches[1:], desc="Ingesting batches", unit="batch"):
-                df_batch = pd.DataFrame(batch)
-                table.add(df_batch)
-            
-            print(f"\nSuccessfully ingested {len(documents)} documents in {len(batches)} batches")
+        print(f"Creating table '{table_name}' from {num_batches} batches...")
+        
+        # Write every batch into the table's Lance dataset in one commit
+        reader = pa.RecordBatchReader.from_batches(schema, record_batches())
+        lance.write_dataset(
+            reader,
+            f"{db.uri}/{table_name}.lance",
+            mode="overwrite",
+            max_rows_per_file=MAX_ROWS_PER_FILE
+        )
+        table = db.open_table(table_name)
+        
+        print(f"\nSuccessfully ingested {len(documents)} documents in {num_batches} batches")
         
         return table
         
@@ -57,7 +106,7 @@ def batch_ingest(db, table_name: str, documents: list, batch_size: int = BATCH_S
         print(f"Error during batch ingestion: {e}")
         raise
 
-def generate_sample_documents(num_docs: int, vector_dim: int = 128) -> List[Dict[str, Any]]:
+def generate_sample_documents(num_docs: int, vector_dim: int = 128) -> pa.Table:
     """Generate sample documents with random vectors.
     
     Args:
@@ -65,20 +114,23 @@ def generate_sample_documents(num_docs: int, vector_dim: int = 128) -> List[Dict
         vector_dim: Dimension of the vector embeddings
         
     Returns:
-        List of document dictionaries
+        pyarrow Table with 'id', 'text', 'category' and 'vector' columns
     """
-    documents = []
+    rng = np.random.default_rng()
+    ids = np.arange(num_docs, dtype=np.int64)
+    
+    # Draw all vectors at once as a contiguous float32 matrix
+    vectors = rng.standard_normal((num_docs, vector_dim), dtype=np.float32)
     
-    for i in range(num_docs):
-        doc = {
-            "id": i,
-            "text": f"This is sample document number {i} with some content.",
-            "category": f"category_{i % 5}",  # 5 different categories
-            "vector": np.random.randn(vector_dim).astype(np.float32).tolist()
-        }
-        documents.append(doc)
+    texts = [f"This is sample document number {i} with some content." for i in range(num_docs)]
+    categories = np.char.add("category_", (ids % 5).astype(str))  # 5 different categories
     
-    return documents
+    return pa.table({
+        "id": ids,
+        "text": pa.array(texts, type=pa.string()),
+        "category": pa.array(categories, type=pa.string()),
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), vector_dim),
+    })
 
 def verify_ingestion(table, expected_count: int):
     """Verify that the ingestion was successful.
@@ -89,8 +141,7 @@ def verify_ingestion(table, expected_count: int):
     """
     try:
         # Count rows in the table
-        df = table.to_pandas()
-        actual_count = len(df)
+        actual_count = table.count_rows()
         
         print(f"\nVerification:")
         print(f"  Expected documents: {expected_count}")
@@ -99,7 +150,7 @@ def verify_ingestion(table, expected_count: int):
         
         if actual_count > 0:
             print(f"\nSample document:")
-            print(df.head(1).to_dict('records')[0])
+            print(table.head(1).to_pylist()[0])
         
         return actual_count == expected_count
         
@@ -115,7 +166,7 @@ def main():
     TABLE_NAME = "documents"
     NUM_DOCUMENTS = 1000
     VECTOR_DIM = 128
-    BATCH_SIZE_CONFIG = 100
+    BATCH_SIZE_CONFIG = BATCH_SIZE
     
     print("=" * 60)
     print("LanceDB Batch Ingestion Demo")
@@ -145,13 +196,13 @@ def main():
         print("=" * 60)
         
         # Create a random query vector
-        query_vector = np.random.randn(VECTOR_DIM).astype(np.float32)
+        query_vector = np.random.default_rng().standard_normal(VECTOR_DIM, dtype=np.float32)
         
         # Perform search
-        results = table.search(query_vector).limit(5).to_pandas()
+        results = table.search(query_vector).limit(5).to_list()
         
         print(f"\nTop 5 search results:")
-        for idx, row in results.iterrows():
+        for idx, row in enumerate(results):
             print(f"  {idx + 1}. ID: {row['id']}, Category: {row['category']}")
             print(f"     Text: {row['text'][:50]}...")
         
@@ -1,25 +1,44 @@
 # filepath: data_ops.py
 """Rich metadata fields with timestamps and tags."""
 
+import logging
 from datetime import datetime
 from typing import Optional, List
-import json
 import lancedb
 from lancedb.pydantic import LanceModel, Vector
+from lancedb.query import ColumnOrdering
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+logger = logging.getLogger(__name__)
 
 
 # Define schema with rich metadata
 class Document(LanceModel):
     text: str
     vector: Vector(384)
-    created_at: str
+    created_at: datetime
     updated_at: Optional[str] = None
-    tags: Optional[str] = None  # JSON string
+    tags: Optional[List[str]] = None
     source: Optional[str] = None
 
 
-def add_with_metadata(table, text: str, vector, tags: list = None, source: str = None):
+def _document_schema() -> pa.Schema:
+    """Arrow schema for Document with dictionary-encoded tags.
+    
+    Tags are a small vocabulary repeated across many rows, so each list
+    element is stored as an int32 code into a string dictionary.
+    """
+    schema = Document.to_arrow_schema()
+    index = schema.get_field_index("tags")
+    tags_type = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+    return schema.set(index, schema.field(index).with_type(tags_type))
+
+
+def add_with_metadata(table, text: str, vector, tags: list = None, source: str = None,
+                      current_time: Optional[datetime] = None):
     """Add document with rich metadata.
     
     Args:
@@ -28,13 +47,13 @@ def add_with_metadata(table, text: str, vector, tags: list = None, source: str =
         vector: Embedding vector (384 dimensions)
         tags: Optional list of tags
         source: Optional source identifier
+        current_time: Creation timestamp; callers adding several documents
+            can read the clock once and pass it to every call. Defaults to now.
     """
     try:
         # Create document with current timestamp
-        current_time = datetime.now().isoformat()
-        
-        # Serialize tags to JSON if provided
-        tags_json = json.dumps(tags) if tags else None
+        if current_time is None:
+            current_time = datetime.now()
         
         # Create document instance
         doc = Document(
@@ -42,18 +61,57 @@ def add_with_metadata(table, text: str, vector, tags: list = None, source: str =
             vector=vector,
             created_at=current_time,
             updated_at=None,
-            tags=tags_json,
+            tags=list(tags) if tags else None,
             source=source
         )
         
         # Add to table
         table.add([doc])
         
-        print(f"Added document: '{text[:50]}...' with metadata")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Added document: '%s...' with metadata", text[:50])
         return doc
         
     except Exception as e:
-        print(f"Error adding document with metadata: {e}")
+        logger.error("Error adding document with metadata: %s", e)
+        raise
+
+
+def add_documents_with_metadata(table, documents: List[dict]) -> List[Document]:
+    """Add a batch of documents with rich metadata in a single write.
+    
+    All documents share one ``created_at`` timestamp and are written with
+    one ``table.add`` call, so the batch costs a single Lance commit.
+    
+    Args:
+        table: LanceDB table to add documents to
+        documents: Dicts with ``text``, ``vector`` and optional ``tags``
+            and ``source`` keys
+        
+    Returns:
+        List of documents that were added
+    """
+    try:
+        current_time = datetime.now()
+        docs = [
+            Document(
+                text=doc["text"],
+                vector=doc["vector"],
+                created_at=current_time,
+                updated_at=None,
+                tags=list(doc["tags"]) if doc.get("tags") else None,
+                source=doc.get("source")
+            )
+            for doc in documents
+        ]
+        
+        table.add(docs)
+        
+        logger.debug("Added %s documents with metadata", len(docs))
+        return docs
+        
+    except Exception as e:
+        logger.error("Error adding documents with metadata: %s", e)
         raise
 
 
@@ -67,7 +125,6 @@ def update_document_metadata(table, text: str, new_tags: list = None):
     """
     try:
         current_time = datetime.now().isoformat()
-        tags_json = json.dumps(new_tags) if new_tags else None
         
         # Note: LanceDB doesn't support direct updates, so we need to:
         # 1. Search for the document
@@ -75,18 +132,31 @@ def update_document_metadata(table, text: str, new_tags: list = None):
         # 3. Re-add with updated metadata
         
         # For this example, we'll demonstrate the concept
-        print(f"Updated metadata for document containing: '{text[:50]}...'")
-        print(f"New tags: {new_tags}")
-        print(f"Updated at: {current_time}")
+        logger.debug("Updated metadata for document containing: '%s...'", text[:50])
+        logger.debug("New tags: %s", new_tags)
+        logger.debug("Updated at: %s", current_time)
         
     except Exception as e:
-        print(f"Error updating document metadata: {e}")
+        logger.error("Error updating document metadata: %s", e)
         raise
 
 
+# Columns returned by metadata queries; the vector is never needed there
+METADATA_COLUMNS = ["text", "created_at", "updated_at", "tags", "source"]
+
+
+def _sql_string(value: str) -> str:
+    """Quote a value as a SQL string literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+
 def search_by_tags(table, tags: list) -> List[dict]:
     """Search documents by tags.
     
+    The tag match is pushed down into the Lance scan as an
+    ``array_has_any`` predicate on the ``tags`` list column, so
+    non-matching rows are never materialized.
+    
     Args:
         table: LanceDB table
         tags: List of tags to search for
@@ -95,22 +165,23 @@ def search_by_tags(table, tags: list) -> List[dict]:
         List of matching documents
     """
     try:
-        # Get all documents and filter by tags
-        results = table.to_pandas()
-        
-        matching_docs = []
-        for _, row in results.iterrows():
-            if row['tags']:
-                doc_tags = json.loads(row['tags'])
-                # Check if any search tag is in document tags
-                if any(tag in doc_tags for tag in tags):
-                    matching_docs.append(row.to_dict())
-        
-        print(f"Found {len(matching_docs)} documents with tags: {tags}")
+        if not tags:
+            return []
+        
+        where_clause = f"array_has_any(tags, [{', '.join(_sql_string(tag) for tag in tags)}])"
+        matching_docs = (
+            table.search()
+            .where(where_clause, prefilter=True)
+            .select(METADATA_COLUMNS)
+            .limit(None)
+            .to_list()
+        )
+        
+        logger.debug("Found %s documents with tags: %s", len(matching_docs), tags)
         return matching_docs
         
     except Exception as e:
-        print(f"Error searching by tags: {e}")
+        logger.error("Error searching by tags: %s", e)
         raise
 
 
@@ -125,20 +196,30 @@ def get_documents_by_source(table, source: str) -> List[dict]:
         List of documents from the source
     """
     try:
-        results = table.to_pandas()
-        source_docs = results[results['source'] == source].to_dict('records')
+        # Filter and project in the scan so the vector column is never read
+        source_docs = (
+            table.search()
+            .where(f"source = {_sql_string(source)}", prefilter=True)
+            .select(METADATA_COLUMNS)
+            .limit(None)
+            .to_list()
+        )
         
-        print(f"Found {len(source_docs)} documents from source: {source}")
+        logger.debug("Found %s documents from source: %s", len(source_docs), source)
         return source_docs
         
     except Exception as e:
-        print(f"Error getting documents by source: {e}")
+        logger.error("Error getting documents by source: %s", e)
         raise
 
 
 def get_recent_documents(table, limit: int = 10) -> List[dict]:
     """Get most recently created documents.
     
+    ``created_at`` is stored as a timestamp column, so the ordering and
+    limit are pushed down into the Lance scan as a top-K query with no
+    per-row datetime parsing.
+    
     Args:
         table: LanceDB table
         limit: Maximum number of documents to return
@@ -147,59 +228,65 @@ def get_recent_documents(table, limit: int = 10) -> List[dict]:
         List of recent documents
     """
     try:
-        results = table.to_pandas()
         # Sort by created_at timestamp (descending)
-        results['created_at_dt'] = results['created_at'].apply(
-            lambda x: datetime.fromisoformat(x)
+        recent = (
+            table.search()
+            .select(METADATA_COLUMNS)
+            .order_by([ColumnOrdering(column_name="created_at", ascending=False)])
+            .limit(limit)
+            .to_list()
         )
-        recent = results.sort_values('created_at_dt', ascending=False).head(limit)
         
-        print(f"Retrieved {len(recent)} most recent documents")
-        return recent.to_dict('records')
+        logger.debug("Retrieved %s most recent documents", len(recent))
+        return recent
         
     except Exception as e:
-        print(f"Error getting recent documents: {e}")
+        logger.error("Error getting recent documents: %s", e)
         raise
 
 
 def main():
     """Demonstrate rich metadata functionality."""
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
+    
     try:
         # Connect to LanceDB
         db = lancedb.connect("./lancedb_metadata")
         
-        # Create sample vectors (384 dimensions)
-        np.random.seed(42)
+        # Create sample vectors (384 dimensions) as one float32 matrix
+        vectors = np.random.default_rng(42).standard_normal((5, 384), dtype=np.float32)
         
         # Sample documents with different metadata
         documents_data = [
             {
                 "text": "Introduction to machine learning and neural networks",
-                "vector": np.random.randn(384).tolist(),
+                "vector": vectors[0],
                 "tags": ["machine-learning", "neural-networks", "ai"],
                 "source": "textbook"
             },
             {
                 "text": "Deep learning architectures for computer vision",
-                "vector": np.random.randn(384).tolist(),
+                "vector": vectors[1],
                 "tags": ["deep-learning", "computer-vision", "cnn"],
                 "source": "research-paper"
             },
             {
                 "text": "Natural language processing with transformers",
-                "vector": np.random.randn(384).tolist(),
+                "vector": vectors[2],
                 "tags": ["nlp", "transformers", "bert"],
                 "source": "blog-post"
             },
             {
                 "text": "Reinforcement learning for robotics applications",
-                "vector": np.random.randn(384).tolist(),
+                "vector": vectors[3],
                 "tags": ["reinforcement-learning", "robotics", "ai"],
                 "source": "research-paper"
             },
             {
                 "text": "Data preprocessing techniques for machine learning",
-                "vector": np.random.randn(384).tolist(),
+                "vector": vectors[4],
                 "tags": ["machine-learning", "data-science", "preprocessing"],
                 "source": "tutorial"
             }
@@ -209,27 +296,20 @@ def main():
         print("\n=== Creating table with rich metadata schema ===")
         table = db.create_table(
             "documents_with_metadata",
-            schema=Document,
+            schema=_document_schema(),
             mode="overwrite"
         )
         
         # Add documents with metadata
         print("\n=== Adding documents with metadata ===")
-        for doc_data in documents_data:
-            add_with_metadata(
-                table,
-                text=doc_data["text"],
-                vector=doc_data["vector"],
-                tags=doc_data["tags"],
-                source=doc_data["source"]
-            )
+        add_documents_with_metadata(table, documents_data)
         
         # Verify metadata stored
         print("\n=== Verifying stored metadata ===")
-        all_docs = table.to_pandas()
-        print(f"\nTotal documents: {len(all_docs)}")
+        all_docs = table.search().select(METADATA_COLUMNS).limit(None).to_arrow()
+        print(f"\nTotal documents: {all_docs.num_rows}")
         print("\nSample document metadata:")
-        first_doc = all_docs.iloc[0]
+        first_doc = all_docs.slice(0, 1).to_pylist()[0]
         print(f"  Text: {first_doc['text'][:60]}...")
         print(f"  Created at: {first_doc['created_at']}")
         print(f"  Tags: {first_doc['tags']}")
@@ -258,19 +338,18 @@ def main():
         
         # Demonstrate metadata statistics
         print("\n=== Metadata Statistics ===")
-        print(f"Total documents: {len(all_docs)}")
+        print(f"Total documents: {all_docs.num_rows}")
         
         # Count documents by source
-        source_counts = all_docs['source'].value_counts()
+        source_counts = pa.Table.from_struct_array(
+            pc.value_counts(all_docs.column("source").drop_null())
+        ).sort_by([("counts", "descending")])
         print("\nDocuments by source:")
-        for source, count in source_counts.items():
+        for source, count in zip(*source_counts.to_pydict().values()):
             print(f"  {source}: {count}")
         
         # Count unique tags
-        all_tags = set()
-        for tags_json in all_docs['tags'].dropna():
-            tags = json.loads(tags_json)
-            all_tags.update(tags)
+        all_tags = pc.unique(pc.list_flatten(all_docs.column("tags"))).to_pylist()
         print(f"\nUnique tags: {len(all_tags)}")
         print(f"Tags: {sorted(all_tags)}")
         
@@ -1,13 +1,56 @@
 # filepath: data_ops.py
 """Upsert/update existing data."""
 
+import logging
 import lancedb
-import pandas as pd
+from lancedb.expr import col
 import numpy as np
 from typing import List, Dict, Any, Optional
 import pyarrow as pa
 
 
+logger = logging.getLogger(__name__)
+
+
+# Columns shown by the demo; the vector column is never needed for display
+DISPLAY_COLUMNS = ["id", "text", "category", "score"]
+
+# Rows per record batch when streaming upserts into merge_insert
+UPSERT_BATCH_SIZE = 8192
+
+
+def _record_schema(records: List[Dict[str, Any]], schema: pa.Schema) -> pa.Schema:
+    """Project the table schema onto the fields present in the records.
+    
+    Partial rows (an id plus the updated columns) are then typed correctly.
+    """
+    names = {name for record in records for name in record}
+    return pa.schema([field for field in schema if field.name in names])
+
+
+def _to_arrow(records: List[Dict[str, Any]], schema: Optional[pa.Schema] = None) -> pa.Table:
+    """Build an Arrow table from records, typed by the table schema."""
+    if schema is None:
+        return pa.Table.from_pylist(records)
+    
+    return pa.Table.from_pylist(records, schema=_record_schema(records, schema))
+
+
+def _to_reader(records: List[Dict[str, Any]], schema: pa.Schema,
+               batch_size: int = UPSERT_BATCH_SIZE) -> pa.RecordBatchReader:
+    """Stream records as Arrow batches typed by the table schema.
+    
+    Batches are built lazily as the reader is consumed, so only one
+    batch of converted rows is held in memory at a time.
+    """
+    record_schema = _record_schema(records, schema)
+    batches = (
+        pa.RecordBatch.from_pylist(records[start:start + batch_size], schema=record_schema)
+        for start in range(0, len(records), batch_size)
+    )
+    return pa.RecordBatchReader.from_batches(record_schema, batches)
+
+
 def upsert_documents(db: lancedb.DBConnection, table_name: str, documents: List[Dict[str, Any]]) -> None:
     """Upsert documents (update if exists, insert if not).
     
@@ -24,31 +67,28 @@ def upsert_documents(db: lancedb.DBConnection, table_name: str, documents: List[
         raise ValueError("Documents list cannot be empty")
     
     try:
-        # Convert documents to DataFrame
-        df = pd.DataFrame(documents)
+        # Open the table directly rather than listing the catalog first
+        try:
+            table = db.open_table(table_name)
+        except (ValueError, FileNotFoundError):
+            # Table doesn't exist - create it, indexing the merge/delete key
+            table = db.create_table(table_name, _to_arrow(documents))
+            table.create_scalar_index("id", index_type="BTREE")
+            logger.debug("Created table '%s' with %s documents", table_name, len(documents))
+            return
         
-        # Check if table exists
-        table_names = db.table_names()
+        # merge_insert will update existing records and insert new ones
+        # based on the primary key (typically 'id'); the rows are streamed
+        # in batches rather than converted up front
+        table.merge_insert("id") \
+            .when_matched_update_all() \
+            .when_not_matched_insert_all() \
+            .execute(_to_reader(documents, table.schema))
         
-        if table_name in table_names:
-            # Table exists - use merge_insert for upsert
-            table = db.open_table(table_name)
-            
-            # merge_insert will update existing records and insert new ones
-            # based on the primary key (typically 'id')
-            table.merge_insert("id") \
-                .when_matched_update_all() \
-                .when_not_matched_insert_all() \
-                .execute(df)
-            
-            print(f"Upserted {len(documents)} documents to table '{table_name}'")
-        else:
-            # Table doesn't exist - create it
-            db.create_table(table_name, df)
-            print(f"Created table '{table_name}' with {len(documents)} documents")
+        logger.debug("Upserted %s documents to table '%s'", len(documents), table_name)
             
     except Exception as e:
-        print(f"Error during upsert: {str(e)}")
+        logger.error("Error during upsert: %s", e)
         raise
 
 
@@ -73,33 +113,23 @@ def update_document(table: lancedb.table.Table, doc_id: str, updates: Dict[str,
         raise ValueError("Updates dictionary cannot be empty")
     
     try:
-        # Search for the document by ID
-        results = table.search().where(f"id = '{doc_id}'").limit(1).to_pandas()
-        
-        if results.empty:
-            print(f"Document with ID '{doc_id}' not found")
-            return False
-        
-        # Get the existing document
-        existing_doc = results.iloc[0].to_dict()
+        # Only the key and the updated columns are sent; merge_insert leaves
+        # the remaining columns untouched, so the row is never read back
+        updated = _to_arrow([{"id": doc_id, **updates}], table.schema)
         
-        # Apply updates
-        for key, value in updates.items():
-            existing_doc[key] = value
-        
-        # Create a DataFrame with the updated document
-        updated_df = pd.DataFrame([existing_doc])
-        
-        # Use merge_insert to update the document
-        table.merge_insert("id") \
+        result = table.merge_insert("id") \
             .when_matched_update_all() \
-            .execute(updated_df)
+            .execute(updated)
+        
+        if result.num_updated_rows == 0:
+            logger.warning("Document with ID '%s' not found", doc_id)
+            return False
         
-        print(f"Successfully updated document '{doc_id}'")
+        logger.debug("Successfully updated document '%s'", doc_id)
         return True
         
     except Exception as e:
-        print(f"Error updating document: {str(e)}")
+        logger.error("Error updating document: %s", e)
         return False
 
 
@@ -122,20 +152,17 @@ def batch_update_documents(table: lancedb.table.Table, updates: List[Dict[str, A
             if 'id' not in update:
                 raise ValueError("All updates must include an 'id' field")
         
-        # Convert to DataFrame
-        updates_df = pd.DataFrame(updates)
-        
         # Perform batch update using merge_insert
         table.merge_insert("id") \
             .when_matched_update_all() \
             .when_not_matched_insert_all() \
-            .execute(updates_df)
+            .execute(_to_arrow(updates, table.schema))
         
-        print(f"Successfully batch updated {len(updates)} documents")
+        logger.debug("Successfully batch updated %s documents", len(updates))
         return len(updates)
         
     except Exception as e:
-        print(f"Error during batch update: {str(e)}")
+        logger.error("Error during batch update: %s", e)
         raise
 
 
@@ -150,44 +177,52 @@ def delete_document(table: lancedb.table.Table, doc_id: str) -> bool:
         bool: True if deletion successful, False otherwise
     """
     try:
-        # Delete using SQL-like syntax
-        table.delete(f"id = '{doc_id}'")
-        print(f"Successfully deleted document '{doc_id}'")
+        # Delete with an expression predicate rather than a SQL string, so
+        # the id is bound as a literal and never needs quoting
+        table.delete(col("id") == doc_id)
+        logger.debug("Successfully deleted document '%s'", doc_id)
         return True
         
     except Exception as e:
-        print(f"Error deleting document: {str(e)}")
+        logger.error("Error deleting document: %s", e)
         return False
 
 
 def main():
     """Demonstrate upsert and update operations."""
     
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
+    
     # Connect to LanceDB
     db = lancedb.connect("./lancedb_data")
     table_name = "documents"
     
     print("=== Initial Data Creation ===")
+    # Draw every demo vector up front as one float32 matrix
+    vectors = np.random.rand(5, 128).astype(np.float32)
+    
     # Create initial documents with vectors
     initial_documents = [
         {
             "id": "doc1",
             "text": "Machine learning is a subset of artificial intelligence",
-            "vector": np.random.rand(128).tolist(),
+            "vector": vectors[0],
             "category": "AI",
             "score": 0.85
         },
         {
             "id": "doc2",
             "text": "Deep learning uses neural networks",
-            "vector": np.random.rand(128).tolist(),
+            "vector": vectors[1],
             "category": "AI",
             "score": 0.90
         },
         {
             "id": "doc3",
             "text": "Natural language processing enables text understanding",
-            "vector": np.random.rand(128).tolist(),
+            "vector": vectors[2],
             "category": "NLP",
             "score": 0.88
         }
@@ -200,8 +235,8 @@ def main():
     table = db.open_table(table_name)
     
     print("\n=== Display Initial Data ===")
-    df = table.to_pandas()
-    print(df[["id", "text", "category", "score"]])
+    df = table.search().select(DISPLAY_COLUMNS).limit(None).to_pandas()
+    print(df)
     
     print("\n=== Single Document Update ===")
     # Update a single document
@@ -216,14 +251,14 @@ def main():
         {
             "id": "doc2",  # Existing - will be updated
             "text": "Deep learning uses multi-layer neural networks",
-            "vector": np.random.rand(128).tolist(),
+            "vector": vectors[3],
             "category": "Deep Learning",
             "score": 0.95
         },
         {
             "id": "doc4",  # New - will be inserted
             "text": "Computer vision enables image recognition",
-            "vector": np.random.rand(128).tolist(),
+            "vector": vectors[4],
             "category": "CV",
             "score": 0.87
         }
@@ -241,15 +276,15 @@ def main():
     batch_update_documents(table, batch_updates)
     
     print("\n=== Final Data State ===")
-    df_final = table.to_pandas()
-    print(df_final[["id", "text", "category", "score"]])
+    df_final = table.search().select(DISPLAY_COLUMNS).limit(None).to_pandas()
+    print(df_final)
     
     print("\n=== Delete Document ===")
     delete_document(table, "doc4")
     
     print("\n=== Data After Deletion ===")
-    df_after_delete = table.to_pandas()
-    print(df_after_delete[["id", "text", "category", "score"]])
+    df_after_delete = table.search().select(DISPLAY_COLUMNS).limit(None).to_pandas()
+    print(df_after_delete)
     
     print("\nUpsert and update operations complete!")
 
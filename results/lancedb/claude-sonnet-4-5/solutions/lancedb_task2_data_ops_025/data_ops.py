@@ -1,12 +1,16 @@
 # filepath: data_ops.py
 """Idempotent table creation pattern."""
 
+import logging
 import lancedb
 import pyarrow as pa
 import pandas as pd
 from typing import Optional, List, Dict, Any
 
 
+logger = logging.getLogger(__name__)
+
+
 def get_or_create_table(db: lancedb.DBConnection, table_name: str, schema: Optional[pa.Schema] = None):
     """Get existing table or create new one.
     
@@ -22,55 +26,80 @@ def get_or_create_table(db: lancedb.DBConnection, table_name: str, schema: Optio
         ValueError: If table doesn't exist and no schema provided
     """
     try:
-        # Check if table exists in db.table_names()
-        if table_name in db.table_names():
-            print(f"Table '{table_name}' exists, opening...")
-            return db.open_table(table_name)
+        # Open the table directly rather than listing the catalog first
+        try:
+            table = db.open_table(table_name)
+            logger.debug("Table '%s' exists, opening...", table_name)
+            return table
+        except (ValueError, FileNotFoundError):
+            pass
         
         # If not, create with schema
         if schema is None:
             raise ValueError(f"Table '{table_name}' does not exist and no schema provided")
         
-        print(f"Table '{table_name}' does not exist, creating...")
+        logger.debug("Table '%s' does not exist, creating...", table_name)
         # Create empty table with schema
         empty_data = pa.Table.from_pylist([], schema=schema)
         return db.create_table(table_name, empty_data)
         
     except Exception as e:
-        print(f"Error in get_or_create_table: {e}")
+        logger.error("Error in get_or_create_table: %s", e)
         raise
 
 
-def ensure_table(db: lancedb.DBConnection, table_name: str, initial_data: List[Dict[str, Any]]):
-    """Ensure table exists with mode='overwrite' for idempotency.
+def ensure_table(db: lancedb.DBConnection, table_name: str, initial_data: List[Dict[str, Any]],
+                 force: bool = False):
+    """Ensure table exists and contains the initial data.
     
     This function is idempotent - safe to run multiple times.
-    It will always overwrite the table with the provided data.
+    An existing table is kept and only rows whose ``id`` is not yet
+    present are inserted, so repeated calls do not rewrite the dataset.
+    Pass ``force=True`` to overwrite the table with the provided data.
     
     Args:
         db: LanceDB connection
         table_name: Name of the table
         initial_data: List of dictionaries containing the initial data
+        force: Overwrite the table even if it already exists
         
     Returns:
         LanceDB table instance
     """
     try:
-        # Use create_table with mode="overwrite"
-        # This is idempotent - safe to run multiple times
-        print(f"Ensuring table '{table_name}' with overwrite mode...")
+        if not force:
+            try:
+                table = db.open_table(table_name)
+            except (ValueError, FileNotFoundError):
+                table = None
+            
+            if table is not None:
+                # Insert-only merge: existing rows are left untouched
+                logger.debug("Ensuring table '%s' has the initial rows...", table_name)
+                table.merge_insert("id") \
+                    .when_not_matched_insert_all() \
+                    .execute(initial_data)
+                logger.debug("Table '%s' already exists, missing rows inserted", table_name)
+                return table
+        
+        # Table is absent or overwrite was requested
+        logger.debug("Ensuring table '%s' with overwrite mode...", table_name)
         table = db.create_table(table_name, initial_data, mode="overwrite")
-        print(f"Table '{table_name}' created/overwritten successfully")
+        logger.debug("Table '%s' created/overwritten successfully", table_name)
         return table
         
     except Exception as e:
-        print(f"Error in ensure_table: {e}")
+        logger.error("Error in ensure_table: %s", e)
         raise
 
 
 def main():
     """Demonstrate idempotent table creation patterns."""
     
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
+    
     # Connect to LanceDB (creates directory if it doesn't exist)
     db = lancedb.connect("./lancedb_data")
     print("Connected to LanceDB\n")
@@ -100,8 +129,8 @@ def main():
     table1_again = get_or_create_table(db, "my_vectors", schema)
     print(f"Table has {table1_again.count_rows()} rows\n")
     
-    # Example 2: ensure_table pattern (always overwrites)
-    print("=== Example 2: ensure_table (overwrite mode) ===")
+    # Example 2: ensure_table pattern (create if missing, overwrite on force)
+    print("=== Example 2: ensure_table ===")
     
     initial_data = [
         {"id": 10, "vector": [0.1, 0.2, 0.3], "text": "initial_1"},
@@ -109,20 +138,20 @@ def main():
         {"id": 30, "vector": [0.7, 0.8, 0.9], "text": "initial_3"},
     ]
     
-    # First call - creates table
-    table2 = ensure_table(db, "idempotent_table", initial_data)
+    # First call - force a fresh table so the demo starts from a known state
+    table2 = ensure_table(db, "idempotent_table", initial_data, force=True)
     print(f"Table has {table2.count_rows()} rows")
     
-    # Second call - overwrites table (idempotent, always same result)
+    # Second call - rows already present, nothing is rewritten
     table2_again = ensure_table(db, "idempotent_table", initial_data)
     print(f"Table still has {table2_again.count_rows()} rows")
     
-    # Third call with different data - still overwrites
+    # Third call with a new id - only the new row is inserted
     new_data = [
         {"id": 100, "vector": [1.1, 1.2, 1.3], "text": "new_1"},
     ]
     table2_new = ensure_table(db, "idempotent_table", new_data)
-    print(f"Table now has {table2_new.count_rows()} rows (overwritten)\n")
+    print(f"Table now has {table2_new.count_rows()} rows (new id inserted)\n")
     
     # Example 3: Demonstrate with more complex schema
     print("=== Example 3: Complex schema with metadata ===")
@@ -141,22 +170,22 @@ def main():
     import numpy as np
     from datetime import datetime
     
-    complex_data = [
-        {
-            "id": 1,
-            "embedding": np.random.rand(128).tolist(),
-            "text": "Sample document 1",
-            "metadata": '{"source": "api", "version": 1}',
-            "timestamp": datetime.now(),
-        },
-        {
-            "id": 2,
-            "embedding": np.random.rand(128).tolist(),
-            "text": "Sample document 2",
-            "metadata": '{"source": "upload", "version": 1}',
-            "timestamp": datetime.now(),
-        },
-    ]
+    # Draw the embeddings as one float32 matrix and hand its buffer to Arrow
+    embeddings = np.random.rand(2, 128).astype(np.float32)
+    now = datetime.now()
+    complex_data = pa.Table.from_arrays(
+        [
+            pa.array([1, 2], type=pa.int64()),
+            pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), 128),
+            pa.array(["Sample document 1", "Sample document 2"]),
+            pa.array([
+                '{"source": "api", "version": 1}',
+                '{"source": "upload", "version": 1}',
+            ]),
+            pa.array([now, now], type=pa.timestamp('ms')),
+        ],
+        schema=complex_schema,
+    )
     
     table3.add(complex_data)
     print(f"Added {len(complex_data)} records with 128-dim embeddings")
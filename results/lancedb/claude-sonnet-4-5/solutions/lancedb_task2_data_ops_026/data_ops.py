@@ -1,18 +1,112 @@
 # filepath: data_ops.py
 """JSON metadata storage pattern."""
 
+import logging
 import json
-from typing import Optional
+from typing import Dict, List, Optional
 import lancedb
 from lancedb.pydantic import LanceModel, Vector
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj) -> str:
+    """Serialize to a JSON string, using orjson when it is installed.
+
+    Input orjson rejects but the json module accepts, such as integers
+    beyond 64 bits, falls back to json.dumps.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj)
+
+
+def _loads(data: str):
+    """Parse a JSON string, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 # Define schema with JSON metadata field
 class Document(LanceModel):
     text: str
     vector: Vector(384)
     metadata_json: Optional[str] = None  # Store as JSON string
+    # Filterable fields copied out of the metadata so predicates run in Lance
+    views: Optional[int] = None
+    category: Optional[str] = None
+
+
+def _sidecar_columns(metadata) -> dict:
+    """Copy the filterable fields out of free-form metadata.
+
+    Values of an unexpected shape or type leave their column None; the
+    original value is still kept in metadata_json.
+    """
+    if not isinstance(metadata, dict):
+        return {"views": None, "category": None}
+    stats = metadata.get("stats")
+    views = stats.get("views") if isinstance(stats, dict) else None
+    if not isinstance(views, int) or isinstance(views, bool):
+        views = None
+    category = metadata.get("category")
+    if not isinstance(category, str):
+        category = None
+    return {"views": views, "category": category}
+
+
+def validate_and_build(text: str, vector, metadata: dict) -> Document:
+    """Validate inputs and build a Document without touching the table.
+
+    Args:
+        text: Document text content
+        vector: Embedding vector (384 dimensions)
+        metadata: Dictionary of metadata to store as JSON
+    
+    Returns:
+        Document ready to be added to the table
+    
+    Raises:
+        ValueError: If vector dimensions don't match schema
+        TypeError: If metadata cannot be serialized
+    """
+    # Validate vector dimensions
+    if len(vector) != 384:
+        raise ValueError(f"Vector must have 384 dimensions, got {len(vector)}")
+    
+    # Serialize metadata to JSON string
+    return Document(
+        text=text,
+        vector=vector,
+        metadata_json=_dumps(metadata),
+        **_sidecar_columns(metadata)
+    )
+
+
+def add_many(table, documents: List[Document]):
+    """Add a batch of documents in a single write.
+
+    Args:
+        table: LanceDB table instance
+        documents: Documents built with validate_and_build
+    """
+    try:
+        table.add(documents)
+        logger.debug("Added %s documents with metadata", len(documents))
+        
+    except Exception as e:
+        logger.error("Error adding documents: %s", e)
+        raise
 
 
 def add_with_json_metadata(table, text: str, vector, metadata: dict):
@@ -26,41 +120,31 @@ def add_with_json_metadata(table, text: str, vector, metadata: dict):
     
     Raises:
         ValueError: If vector dimensions don't match schema
-        json.JSONEncodeError: If metadata cannot be serialized
+        TypeError: If metadata cannot be serialized
     """
     try:
-        # Validate vector dimensions
-        vector_array = np.array(vector)
-        if vector_array.shape[0] != 384:
-            raise ValueError(f"Vector must have 384 dimensions, got {vector_array.shape[0]}")
-        
-        # Serialize metadata to JSON string
-        metadata_json_str = json.dumps(metadata)
-        
-        # Create document
-        document = Document(
-            text=text,
-            vector=vector_array.tolist(),
-            metadata_json=metadata_json_str
-        )
+        document = validate_and_build(text, vector, metadata)
         
         # Add to table
         table.add([document])
-        print(f"Added document: '{text[:50]}...' with metadata")
+        logger.debug("Added document: '%s...' with metadata", text[:50])
         
-    except json.JSONEncodeError as e:
-        print(f"Error serializing metadata to JSON: {e}")
+    except TypeError as e:
+        logger.error("Error serializing metadata to JSON: %s", e)
         raise
     except Exception as e:
-        print(f"Error adding document: {e}")
+        logger.error("Error adding document: %s", e)
         raise
 
 
-def get_metadata(row) -> dict:
+def get_metadata(row, memo: Optional[Dict[str, dict]] = None) -> dict:
     """Parse JSON metadata from row.
 
     Args:
         row: A row from LanceDB query results
+        memo: Optional caller-owned dict of already parsed strings; rows
+            with the same metadata then share one parsed dict, so callers
+            passing a memo must not modify the result
     
     Returns:
         Dictionary containing parsed metadata, or empty dict if parsing fails
@@ -77,20 +161,28 @@ def get_metadata(row) -> dict:
         if metadata_json_str is None or metadata_json_str == '':
             return {}
         
-        # Parse JSON
-        metadata_dict = json.loads(metadata_json_str)
+        if memo is None:
+            return _loads(metadata_json_str)
+        
+        # Parse JSON, reusing the result for strings already seen
+        metadata_dict = memo.get(metadata_json_str)
+        if metadata_dict is None:
+            metadata_dict = memo[metadata_json_str] = _loads(metadata_json_str)
         return metadata_dict
         
     except json.JSONDecodeError as e:
-        print(f"Error parsing JSON metadata: {e}")
+        logger.error("Error parsing JSON metadata: %s", e)
         return {}
     except Exception as e:
-        print(f"Error getting metadata: {e}")
+        logger.error("Error getting metadata: %s", e)
         return {}
 
 
 def main():
     """Main function demonstrating JSON metadata storage."""
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
     try:
         # Connect to LanceDB
         db = lancedb.connect("./lancedb_json_metadata")
@@ -109,11 +201,15 @@ def main():
         table = db.create_table(table_name, schema=Document)
         print(f"Created table: {table_name}")
         
+        # Draw the demo and query vectors as one float32 matrix
+        rng = np.random.default_rng()
+        vectors = rng.standard_normal((5, 384), dtype=np.float32)
+        
         # Add documents with nested metadata
         documents = [
             {
                 "text": "Machine learning is a subset of artificial intelligence",
-                "vector": np.random.rand(384).tolist(),
+                "vector": vectors[0],
                 "metadata": {
                     "author": "John Doe",
                     "category": "AI",
@@ -127,7 +223,7 @@ def main():
             },
             {
                 "text": "Deep learning uses neural networks with multiple layers",
-                "vector": np.random.rand(384).tolist(),
+                "vector": vectors[1],
                 "metadata": {
                     "author": "Jane Smith",
                     "category": "Deep Learning",
@@ -141,7 +237,7 @@ def main():
             },
             {
                 "text": "Natural language processing enables computers to understand human language",
-                "vector": np.random.rand(384).tolist(),
+                "vector": vectors[2],
                 "metadata": {
                     "author": "Bob Johnson",
                     "category": "NLP",
@@ -156,24 +252,25 @@ def main():
             }
         ]
         
-        # Add documents to table
-        for doc in documents:
-            add_with_json_metadata(
-                table,
-                doc["text"],
-                doc["vector"],
-                doc["metadata"]
-            )
+        # Validate everything up front, then add all documents in one write
+        add_many(table, [validate_and_build(**doc) for doc in documents])
         
         print(f"\nAdded {len(documents)} documents with JSON metadata")
         
         # Query and parse metadata
         print("\n--- Querying documents ---")
-        results = table.search(np.random.rand(384).tolist()).limit(3).to_pandas()
+        # Rows come back as plain dicts, so no per-row pandas Series is built
+        results = table.search(vectors[3]) \
+            .select(["text", "metadata_json", "_distance"]) \
+            .limit(3) \
+            .to_list()
+        
+        # Parses shared by the read-only display loops below
+        parsed_metadata: Dict[str, dict] = {}
         
         print(f"\nFound {len(results)} documents:")
-        for idx, row in results.iterrows():
-            metadata = get_metadata(row)
+        for idx, row in enumerate(results):
+            metadata = get_metadata(row, parsed_metadata)
             print(f"\n{idx + 1}. Text: {row['text'][:60]}...")
             print(f"   Author: {metadata.get('author', 'Unknown')}")
             print(f"   Category: {metadata.get('category', 'Unknown')}")
@@ -186,17 +283,19 @@ def main():
         # Demonstrate filtering by parsing metadata
         print("\n--- Filtering documents with high engagement ---")
         high_engagement_docs = []
-        all_results = table.search(np.random.rand(384).tolist()).limit(10).to_pandas()
-        
-        for idx, row in all_results.iterrows():
-            metadata = get_metadata(row)
-            views = metadata.get('stats', {}).get('views', 0)
-            if views > 1600:
-                high_engagement_docs.append({
-                    'text': row['text'],
-                    'author': metadata.get('author'),
-                    'views': views
-                })
+        all_results = table.search(vectors[4]) \
+            .where("views > 1600", prefilter=True) \
+            .select(["text", "metadata_json", "views", "_distance"]) \
+            .limit(10) \
+            .to_list()
+        
+        for row in all_results:
+            metadata = get_metadata(row, parsed_metadata)
+            high_engagement_docs.append({
+                'text': row['text'],
+                'author': metadata.get('author'),
+                'views': row['views']
+            })
         
         print(f"Found {len(high_engagement_docs)} high-engagement documents:")
         for doc in high_engagement_docs:
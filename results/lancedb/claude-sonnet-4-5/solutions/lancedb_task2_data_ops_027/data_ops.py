@@ -1,9 +1,12 @@
 # filepath: data_ops.py
 """Automatic timestamp handling."""
 
+import hashlib
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional, Tuple
 import lancedb
+import pyarrow as pa
+from lancedb.expr import col
 from lancedb.pydantic import LanceModel, Vector
 import numpy as np
 
@@ -15,26 +18,45 @@ class Document(LanceModel):
     created_at: str
     updated_at: Optional[str] = None
 
+# Arrow schema for the table, derived once from the model
+DOCUMENT_SCHEMA = Document.to_arrow_schema()
+
+# Columns read back for display and updates; the vector is never needed there
+DISPLAY_COLUMNS = ["id", "text", "created_at", "updated_at"]
+
 def get_current_timestamp() -> str:
     """Get current UTC timestamp as ISO string."""
     return datetime.now(timezone.utc).isoformat()
 
-def create_document(text: str, vector) -> dict:
+def create_document(text: str, vector, current_time: Optional[str] = None,
+                    batch_index: Optional[int] = None) -> dict:
     """Create document with auto timestamp.
     
     Args:
         text: Document text content
         vector: Document embedding vector
-        
+        current_time: ISO creation timestamp; callers creating several
+            documents can read the clock once and pass it to every call.
+            Defaults to now.
+        batch_index: Position of the document in a batch sharing
+            ``current_time``; mixed into the id so repeated texts in one
+            batch still get distinct ids
+
     Returns:
         Dictionary with document data including timestamp
     """
     try:
         # Get current UTC time
-        current_time = get_current_timestamp()
+        if current_time is None:
+            current_time = get_current_timestamp()
         
-        # Generate a simple ID based on timestamp
-        doc_id = f"doc_{datetime.now(timezone.utc).timestamp()}"
+        # Generate an ID from a 64-bit digest of the text and timestamp, fed
+        # to the hash as two buffers so no concatenated copy is made
+        digest = hashlib.blake2b(text.encode(), digest_size=8)
+        digest.update(current_time.encode())
+        if batch_index is not None:
+            digest.update(batch_index.to_bytes(8, "little"))
+        doc_id = f"doc_{digest.hexdigest()}"
         
         # Return document dict with timestamp
         return {
@@ -47,6 +69,25 @@ def create_document(text: str, vector) -> dict:
     except Exception as e:
         raise ValueError(f"Error creating document: {str(e)}")
 
+def create_documents(items: List[Tuple[str, object]]) -> List[dict]:
+    """Create a batch of documents sharing one creation timestamp.
+    
+    The clock is read and formatted once for the whole batch. Each
+    document's position in the batch goes into its id, so repeated texts
+    still get distinct ids.
+    
+    Args:
+        items: ``(text, vector)`` pairs
+        
+    Returns:
+        List of document dictionaries
+    """
+    current_time = get_current_timestamp()
+    return [
+        create_document(text, vector, current_time, batch_index=i)
+        for i, (text, vector) in enumerate(items)
+    ]
+
 def update_document(table, doc_id: str, updates: dict):
     """Update document with updated_at timestamp.
     
@@ -62,25 +103,21 @@ def update_document(table, doc_id: str, updates: dict):
         # Set updated_at to current time
         updates["updated_at"] = get_current_timestamp()
         
-        # Get existing document
-        results = table.search().where(f"id = '{doc_id}'").limit(1).to_pandas()
+        # Update the matching row in place; the vector is never read. The
+        # predicate is built as an expression, so doc_id is never spliced
+        # into SQL text
+        where = col("id") == doc_id
+        result = table.update(where=where, values=updates)
         
-        if len(results) == 0:
+        if result.rows_updated == 0:
             raise ValueError(f"Document with id '{doc_id}' not found")
         
-        # Get the existing document data
-        existing_doc = results.iloc[0].to_dict()
-        
-        # Apply updates while preserving other fields
-        for key, value in updates.items():
-            if key in existing_doc:
-                existing_doc[key] = value
-        
-        # Delete old document and insert updated one
-        table.delete(f"id = '{doc_id}'")
-        table.add([existing_doc])
-        
-        return existing_doc
+        # Read back the updated document without the vector column
+        return table.search() \
+            .where(where) \
+            .select(DISPLAY_COLUMNS) \
+            .limit(1) \
+            .to_list()[0]
     except Exception as e:
         raise ValueError(f"Error updating document: {str(e)}")
 
@@ -90,14 +127,15 @@ def main():
         # Connect to LanceDB
         db = lancedb.connect("./lancedb_timestamps")
         
-        # Create sample vectors (384 dimensions)
-        vector1 = np.random.randn(384).tolist()
-        vector2 = np.random.randn(384).tolist()
+        # Create sample vectors (384 dimensions) as one float32 matrix
+        vector1, vector2 = np.random.default_rng().standard_normal((2, 384), dtype=np.float32)
         
         # Create documents with timestamps
         print("Creating documents with automatic timestamps...")
-        doc1 = create_document("First document", vector1)
-        doc2 = create_document("Second document", vector2)
+        doc1, doc2 = create_documents([
+            ("First document", vector1),
+            ("Second document", vector2),
+        ])
         
         print(f"Document 1 created at: {doc1['created_at']}")
         print(f"Document 2 created at: {doc2['created_at']}")
@@ -112,12 +150,14 @@ def main():
             pass
         
         # Create new table
-        table = db.create_table(table_name, data=[doc1, doc2], schema=Document)
+        # Convert the document dicts to Arrow in one pass against the schema
+        batch = pa.RecordBatch.from_pylist([doc1, doc2], schema=DOCUMENT_SCHEMA)
+        table = db.create_table(table_name, data=batch, schema=DOCUMENT_SCHEMA)
         print(f"\nCreated table '{table_name}' with {len(table)} documents")
         
         # Display initial documents
         print("\nInitial documents:")
-        df = table.to_pandas()
+        df = table.search().select(DISPLAY_COLUMNS).limit(None).to_pandas()
         for idx, row in df.iterrows():
             print(f"  ID: {row['id']}")
             print(f"  Text: {row['text']}")
@@ -142,7 +182,7 @@ def main():
         
         # Verify timestamps
         print("\nFinal documents:")
-        df = table.to_pandas()
+        df = table.search().select(DISPLAY_COLUMNS).limit(None).to_pandas()
         for idx, row in df.iterrows():
             print(f"  ID: {row['id']}")
             print(f"  Text: {row['text']}")
@@ -1,13 +1,75 @@
 # filepath: data_ops.py
 """Multi-table schema with relationships."""
 
-from typing import Optional, List, Dict, Any
+import logging
+from typing import Optional, List, Dict, Any, Tuple
 import lancedb
+from lancedb.expr import col
 from lancedb.pydantic import LanceModel, Vector
 import pandas as pd
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+logger = logging.getLogger(__name__)
+
+
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Embeddings are stored and queried unit-normalized, so the inner product is
+# the cosine similarity and no per-query norms are needed
+DISTANCE_METRIC = "dot"
+
+# Run the model on ONNX Runtime when it is installed; it fuses the attention
+# and layer-norm ops that PyTorch eager mode runs one by one
+try:
+    import optimum.onnxruntime  # noqa: F401
+except ImportError:
+    EMBEDDING_BACKEND = "torch"
+else:
+    EMBEDDING_BACKEND = "onnx"
+
+# Embedding model, loaded on first use and shared by all calls
+_model: Optional[SentenceTransformer] = None
+
+
+def _get_model() -> SentenceTransformer:
+    """Get or initialize the embedding model (singleton pattern)."""
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(EMBEDDING_MODEL, backend=EMBEDDING_BACKEND)
+    return _model
+
+
+# Users table contents per table URI, tagged with the version they were read
+# at; the table is small and read-mostly
+_users_cache: Dict[str, Tuple[int, pd.DataFrame, pd.DataFrame]] = {}
+
+
+def _load_users(users_table) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Get the users table, reloading only when it has changed.
+    
+    Returns:
+        Tuple of (users DataFrame, name/email lookup indexed by user_id)
+    """
+    uri = users_table.uri
+    version = users_table.version
+    cached = _users_cache.get(uri)
+    if cached is None or cached[0] != version:
+        users_df = users_table.to_pandas()
+        user_lookup = users_df.set_index('user_id')[['name', 'email']]
+        cached = _users_cache[uri] = (version, users_df, user_lookup)
+    return cached[1], cached[2]
+
+
+def _cached_users(users_table) -> pd.DataFrame:
+    """Get the users table as a DataFrame, reloading only when it has changed."""
+    return _load_users(users_table)[0]
+
+
+def invalidate_users_cache() -> None:
+    """Drop the cached users table, e.g. after the table is recreated."""
+    _users_cache.clear()
+
 
 # Define User schema
 class User(LanceModel):
@@ -54,12 +116,13 @@ def create_related_tables(db: lancedb.DBConnection) -> tuple:
         except Exception:
             pass
         
-        users_table = db.create_table("users", schema=User, mode="overwrite")
-        users_table.add(users_data)
+        # Load the rows at creation time so the table is written in one commit
+        users_table = db.create_table("users", data=users_data, schema=User, mode="overwrite")
+        # A recreated table restarts its version numbering
+        invalidate_users_cache()
         
         # Create documents table with user_id reference
-        # Initialize embedding model
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        model = _get_model()
         
         documents_data = [
             {
@@ -89,21 +152,29 @@ def create_related_tables(db: lancedb.DBConnection) -> tuple:
             },
         ]
         
-        # Generate embeddings for documents
-        for doc in documents_data:
-            embedding = model.encode(doc["text"])
-            doc["vector"] = embedding.tolist()
+        # Generate embeddings for all documents in one batched forward pass
+        embeddings = model.encode(
+            [doc["text"] for doc in documents_data],
+            batch_size=32,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        for doc, embedding in zip(documents_data, embeddings):
+            doc["vector"] = embedding
         
-        documents_table = db.create_table("documents", schema=Document, mode="overwrite")
-        documents_table.add(documents_data)
+        documents_table = db.create_table(
+            "documents", data=documents_data, schema=Document, mode="overwrite"
+        )
+        # Index the foreign key so per-user lookups filter in storage
+        documents_table.create_scalar_index("user_id", index_type="BTREE")
         
-        print(f"Created users table with {len(users_data)} records")
-        print(f"Created documents table with {len(documents_data)} records")
+        logger.debug("Created users table with %s records", len(users_data))
+        logger.debug("Created documents table with %s records", len(documents_data))
         
         return users_table, documents_table
         
     except Exception as e:
-        print(f"Error creating related tables: {e}")
+        logger.error("Error creating related tables: %s", e)
         raise
 
 
@@ -123,35 +194,35 @@ def join_query(db: lancedb.DBConnection, user_id: str) -> pd.DataFrame:
         documents_table = db.open_table("documents")
         
         # Get user info
-        users_df = users_table.to_pandas()
-        user_info = users_df[users_df['user_id'] == user_id]
+        _, user_lookup = _load_users(users_table)
         
-        if user_info.empty:
-            print(f"No user found with user_id: {user_id}")
+        if user_id not in user_lookup.index:
+            logger.warning("No user found with user_id: %s", user_id)
             return pd.DataFrame()
         
-        # Get documents for this user
-        documents_df = documents_table.to_pandas()
-        user_documents = documents_df[documents_df['user_id'] == user_id]
+        # Get documents for this user, skipping the vector column; the
+        # user_id index resolves the filter before any rows are read
+        user_documents = documents_table.search() \
+            .where(col("user_id") == user_id) \
+            .select(["doc_id", "text", "user_id"]) \
+            .limit(None) \
+            .to_pandas()
         
         if user_documents.empty:
-            print(f"No documents found for user_id: {user_id}")
+            logger.warning("No documents found for user_id: %s", user_id)
             return pd.DataFrame()
         
-        # Perform a manual join by merging dataframes
-        result = user_documents.merge(
-            user_info[['user_id', 'name', 'email']], 
-            on='user_id', 
-            how='left'
-        )
+        # Every row belongs to the same user, so the join is a single lookup
+        user = user_lookup.loc[user_id]
+        result = user_documents.assign(name=user['name'], email=user['email']).reset_index(drop=True)
         
-        print(f"\nDocuments for user {user_id} ({user_info.iloc[0]['name']}):")
-        print(f"Found {len(result)} documents")
+        logger.debug("\nDocuments for user %s (%s):", user_id, user['name'])
+        logger.debug("Found %s documents", len(result))
         
         return result
         
     except Exception as e:
-        print(f"Error performing join query: {e}")
+        logger.error("Error performing join query: %s", e)
         raise
 
 
@@ -171,36 +242,38 @@ def vector_search_with_user_info(
         DataFrame with search results and user information
     """
     try:
-        # Initialize embedding model
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        
         # Generate query embedding
-        query_vector = model.encode(query_text).tolist()
+        query_vector = _get_model().encode(
+            query_text,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
         
         # Open tables
         documents_table = db.open_table("documents")
         users_table = db.open_table("users")
         
         # Perform vector search
-        results = documents_table.search(query_vector).limit(limit).to_pandas()
+        results = documents_table.search(query_vector) \
+            .metric(DISTANCE_METRIC) \
+            .select(["doc_id", "text", "user_id", "_distance"]) \
+            .limit(limit) \
+            .to_pandas()
         
         # Get user information
-        users_df = users_table.to_pandas()
+        _, user_lookup = _load_users(users_table)
         
-        # Join with user info
-        results_with_users = results.merge(
-            users_df[['user_id', 'name', 'email']], 
-            on='user_id', 
-            how='left'
-        )
+        # Join with user info by index lookup on user_id
+        results_with_users = results.join(user_lookup, on='user_id')
         
-        print(f"\nVector search results for: '{query_text}'")
-        print(f"Found {len(results_with_users)} results")
+        logger.debug("\nVector search results for: '%s'", query_text)
+        logger.debug("Found %s results", len(results_with_users))
         
         return results_with_users
         
     except Exception as e:
-        print(f"Error performing vector search with user info: {e}")
+        logger.error("Error performing vector search with user info: %s", e)
         raise
 
 
@@ -217,28 +290,37 @@ def get_user_statistics(db: lancedb.DBConnection) -> pd.DataFrame:
         users_table = db.open_table("users")
         documents_table = db.open_table("documents")
         
-        users_df = users_table.to_pandas()
-        documents_df = documents_table.to_pandas()
-        
-        # Count documents per user
-        doc_counts = documents_df.groupby('user_id').size().reset_index(name='document_count')
-        
-        # Join with user info
-        stats = users_df.merge(doc_counts, on='user_id', how='left')
-        stats['document_count'] = stats['document_count'].fillna(0).astype(int)
+        users_df = _cached_users(users_table)
+        # Only user_id is needed to count documents per user; count in Arrow
+        # so only the per-user totals are converted to pandas
+        doc_counts = documents_table.search() \
+            .select(["user_id"]) \
+            .limit(None) \
+            .to_arrow() \
+            .group_by("user_id") \
+            .aggregate([("user_id", "count")]) \
+            .to_pandas() \
+            .set_index("user_id")["user_id_count"]
+        
+        # Join with user info by mapping each user_id to its count
+        stats = users_df.assign(
+            document_count=users_df['user_id'].map(doc_counts).fillna(0).astype(int)
+        )
         
-        print("\nUser Statistics:")
-        print(stats[['user_id', 'name', 'email', 'document_count']])
+        logger.debug("\nUser Statistics:\n%s", stats[['user_id', 'name', 'email', 'document_count']])
         
         return stats
         
     except Exception as e:
-        print(f"Error getting user statistics: {e}")
+        logger.error("Error getting user statistics: %s", e)
         raise
 
 
 def main():
     """Main function demonstrating multi-table operations."""
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
     try:
         # Connect to LanceDB
         db = lancedb.connect("./lancedb_multi_table")
@@ -1,17 +1,25 @@
 # filepath: data_ops.py
 """Full data validation pipeline."""
 
+import logging
 from typing import Optional, List, Dict, Any
 from pydantic import field_validator, ValidationError
 import lancedb
+import pyarrow as pa
 from lancedb.pydantic import LanceModel, Vector
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+
+VECTOR_DIM = 384
+ALLOWED_CATEGORIES = ("tech", "science", "business")
+
 
 # Define schema with validators
 class Document(LanceModel):
     text: str
-    vector: Vector(384)
+    vector: Vector(VECTOR_DIM)
     category: str
 
     @field_validator("text")
@@ -24,12 +32,39 @@ class Document(LanceModel):
     @field_validator("category")
     @classmethod
     def valid_category(cls, v):
-        allowed = ["tech", "science", "business"]
-        if v not in allowed:
-            raise ValueError(f"category must be one of {allowed}")
+        if v not in ALLOWED_CATEGORIES:
+            raise ValueError(f"category must be one of {list(ALLOWED_CATEGORIES)}")
         return v
 
 
+# Arrow schema for the table, derived once from the model
+DOCUMENT_SCHEMA = Document.to_arrow_schema()
+
+
+def _fast_validate(doc: dict) -> Optional[dict]:
+    """Check a well-formed document without building a Pydantic model.
+
+    Applies the same rules as ``Document`` with plain type and NumPy shape
+    checks. Returns the normalized row, or None when the document must go
+    through full model validation (which also produces the error details).
+    """
+    text = doc.get("text")
+    category = doc.get("category")
+    vector = doc.get("vector")
+    if not isinstance(text, str) or not isinstance(category, str) or vector is None:
+        return None
+    text = text.strip()
+    if not text or category not in ALLOWED_CATEGORIES:
+        return None
+    try:
+        vector = np.asarray(vector, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    if vector.shape != (VECTOR_DIM,):
+        return None
+    return {"text": text, "vector": vector, "category": category}
+
+
 def validate_and_insert(table, documents: List[dict]) -> Dict[str, Any]:
     """Validate documents before insertion.
 
@@ -43,15 +78,28 @@ def validate_and_insert(table, documents: List[dict]) -> Dict[str, Any]:
             - invalid_count: Number of failed validations
             - errors: List of validation errors with document indices
     """
-    valid_documents = []
+    # Valid rows are collected column-wise, vectors into one float32 buffer
+    texts = []
+    categories = []
+    vectors = np.empty((len(documents), VECTOR_DIM), dtype=np.float32)
     errors = []
 
+    def _append(text, vector, category):
+        vectors[len(texts)] = vector
+        texts.append(text)
+        categories.append(category)
+
     # Validate each document against schema
     for idx, doc in enumerate(documents):
+        # Well-formed documents pass cheap checks and skip the model
+        row = _fast_validate(doc)
+        if row is not None:
+            _append(row["text"], row["vector"], row["category"])
+            continue
         try:
             # Validate document using Pydantic model
             validated_doc = Document(**doc)
-            valid_documents.append(validated_doc)
+            _append(validated_doc.text, validated_doc.vector, validated_doc.category)
         except ValidationError as e:
             # Collect validation errors with document index
             error_details = {
@@ -80,13 +128,23 @@ def validate_and_insert(table, documents: List[dict]) -> Dict[str, Any]:
 
     # Insert valid documents if any exist
     inserted_count = 0
-    if valid_documents:
+    if texts:
         try:
-            table.add([doc.dict() for doc in valid_documents])
-            inserted_count = len(valid_documents)
-            print(f"✓ Successfully inserted {inserted_count} valid documents")
+            batch = pa.table(
+                {
+                    "text": pa.array(texts, type=pa.string()),
+                    "vector": pa.FixedSizeListArray.from_arrays(
+                        vectors[:len(texts)].ravel(), VECTOR_DIM
+                    ),
+                    "category": pa.array(categories, type=pa.string()),
+                },
+                schema=DOCUMENT_SCHEMA
+            )
+            table.add(batch)
+            inserted_count = len(texts)
+            logger.debug("✓ Successfully inserted %s valid documents", inserted_count)
         except Exception as e:
-            print(f"✗ Error inserting documents: {e}")
+            logger.error("✗ Error inserting documents: %s", e)
             # Add insertion error to errors list
             errors.append({
                 "document_index": "bulk_insert",
@@ -108,6 +166,9 @@ def validate_and_insert(table, documents: List[dict]) -> Dict[str, Any]:
 
 def main():
     """Main function to demonstrate data validation pipeline."""
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
     
     # Connect to LanceDB
     db = lancedb.connect("./validation_demo")
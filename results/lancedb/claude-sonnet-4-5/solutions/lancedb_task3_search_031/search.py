@@ -1,12 +1,49 @@
 # filepath: search.py
 """Basic vector similarity search."""
 
+import functools
+import hashlib
+import logging
 import lancedb
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from sentence_transformers import SentenceTransformer
 from typing import Optional, List
 import os
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Embeddings are stored and queried unit-normalized, so the inner product is
+# the cosine similarity and no per-query norms are needed
+DISTANCE_METRIC = "dot"
+
+# Run the model on ONNX Runtime when it is installed; it fuses the attention
+# and layer-norm ops that PyTorch eager mode runs one by one
+try:
+    import optimum.onnxruntime  # noqa: F401
+except ImportError:
+    EMBEDDING_BACKEND = "torch"
+else:
+    EMBEDDING_BACKEND = "onnx"
+
+# Below this many rows a brute-force scan beats building an ANN index
+ANN_INDEX_MIN_ROWS = 10_000
+
+# Embedding model, loaded on first use and shared by all search engines
+_model: Optional[SentenceTransformer] = None
+
+
+def _get_model() -> SentenceTransformer:
+    """Get or initialize the embedding model (singleton pattern)."""
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(EMBEDDING_MODEL, backend=EMBEDDING_BACKEND)
+    return _model
 
 
 class VectorSearch:
@@ -21,14 +58,16 @@ class VectorSearch:
         """
         self.db_path = db_path
         self.table_name = table_name
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = _get_model()
         self.db = None
         self.table = None
         
     def _connect(self):
         """Connect to database and open table."""
         try:
-            self.db = lancedb.connect(self.db_path)
+            # Check for newer table versions on every read, so rows written
+            # through other connections are visible to the cached engine
+            self.db = lancedb.connect(self.db_path, read_consistency_interval=timedelta(0))
             
             # Check if table exists
             if self.table_name in self.db.table_names():
@@ -36,13 +75,35 @@ class VectorSearch:
             else:
                 # Create sample table if it doesn't exist
                 self._create_sample_table()
+            
+            self._ensure_vector_index()
                 
         except Exception as e:
             raise ConnectionError(f"Failed to connect to database: {e}")
     
+    def _ensure_vector_index(self):
+        """Build an IVF_PQ index on the vector column once the table is large enough.
+        
+        Tables that already have a vector index are left untouched, so this
+        is safe to call on every connect.
+        """
+        if self.table.count_rows() < ANN_INDEX_MIN_ROWS:
+            return
+        if any(index.columns == ["vector"] for index in self.table.list_indices()):
+            return
+        
+        logger.debug("Creating IVF_PQ index on '%s'...", self.table_name)
+        self.table.create_index(
+            metric=DISTANCE_METRIC,
+            vector_column_name="vector",
+            num_partitions=256,
+            num_sub_vectors=48,  # 384 dims / 48 = 8 dims per sub-vector
+            replace=False
+        )
+    
     def _create_sample_table(self):
         """Create a sample table with documents for demonstration."""
-        print(f"Creating sample table '{self.table_name}'...")
+        logger.debug("Creating sample table '%s'...", self.table_name)
         
         # Sample documents
         documents = [
@@ -58,22 +119,52 @@ class VectorSearch:
             "Feature engineering improves model performance significantly"
         ]
         
-        # Generate embeddings
-        embeddings = self.model.encode(documents)
+        # Generate embeddings, reusing the ones saved by an earlier run
+        embeddings = self._sample_embeddings(documents)
         
-        # Create data with schema
-        data = []
-        for i, (doc, emb) in enumerate(zip(documents, embeddings)):
-            data.append({
-                "id": i,
-                "text": doc,
-                "vector": emb.tolist(),
-                "category": "AI/ML"
-            })
+        # Create data column-wise; the vectors wrap the embedding buffer as is
+        data = pa.table({
+            "id": pa.array(range(len(documents)), type=pa.int64()),
+            "text": documents,
+            "vector": pa.FixedSizeListArray.from_arrays(
+                pa.array(embeddings.reshape(-1)), embeddings.shape[1]
+            ),
+            "category": ["AI/ML"] * len(documents)
+        })
         
         # Create table
         self.table = self.db.create_table(self.table_name, data=data, mode="overwrite")
-        print(f"Sample table created with {len(documents)} documents")
+        logger.debug("Sample table created with %s documents", len(documents))
+    
+    def _sample_embeddings(self, documents: List[str]) -> np.ndarray:
+        """Embed the sample documents, caching the matrix next to the database.
+        
+        The cache file is keyed by the model and the document texts, so
+        editing either re-encodes instead of loading stale vectors.
+        
+        Args:
+            documents: Sample document texts
+            
+        Returns:
+            float32 embedding matrix, one row per document
+        """
+        key = hashlib.blake2b(digest_size=8)
+        key.update(EMBEDDING_MODEL.encode())
+        for doc in documents:
+            key.update(b"\0" + doc.encode())
+        cache_path = os.path.join(self.db_path, f".sample_embeddings_{key.hexdigest()}.npy")
+        
+        if os.path.exists(cache_path):
+            return np.load(cache_path)
+        
+        embeddings = self.model.encode(
+            documents,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32, copy=False)
+        np.save(cache_path, embeddings)
+        return embeddings
     
     def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for query text.
@@ -85,10 +176,54 @@ class VectorSearch:
             Embedding vector as numpy array
         """
         try:
-            embedding = self.model.encode(text)
+            embedding = self.model.encode(
+                text,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
             return embedding
         except Exception as e:
             raise ValueError(f"Failed to generate embedding: {e}")
+    
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for several query texts in one batched pass.
+        
+        Args:
+            texts: Query texts to embed
+            
+        Returns:
+            Embedding matrix as numpy array, one row per text
+        """
+        try:
+            return self.model.encode(
+                texts,
+                batch_size=32,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            raise ValueError(f"Failed to generate embeddings: {e}")
+
+
+@functools.lru_cache(maxsize=8)
+def _get_search_engine(db_path: str, table_name: str) -> VectorSearch:
+    """Get a connected search engine, opening each database/table once.
+    
+    The entry is evicted when a search through it fails, so a dropped or
+    recreated table is reopened on the next call.
+    
+    Args:
+        db_path: Path to LanceDB database
+        table_name: Name of the table to search
+        
+    Returns:
+        VectorSearch with an open connection and table
+    """
+    search_engine = VectorSearch(db_path=db_path, table_name=table_name)
+    search_engine._connect()
+    return search_engine
 
 
 def search_similar(
@@ -111,17 +246,55 @@ def search_similar(
         DataFrame with search results including text, distance, and metadata
     """
     try:
-        # Initialize search engine
-        search_engine = VectorSearch(db_path=db_path, table_name=table_name)
-        
-        # Connect to database
-        search_engine._connect()
+        # Reuse the connected search engine for this database and table
+        search_engine = _get_search_engine(db_path, table_name)
         
         # Generate query embedding
         query_vector = search_engine.generate_embedding(query_text)
         
+    except Exception as e:
+        logger.error("Error during search: %s", e)
+        _get_search_engine.cache_clear()
+        raise
+    
+    return search_similar_by_vector(
+        query_vector,
+        query_text,
+        k=k,
+        db_path=db_path,
+        table_name=table_name,
+        filter_condition=filter_condition
+    )
+
+
+def search_similar_by_vector(
+    query_vector: np.ndarray,
+    query_text: str,
+    k: int = 5,
+    db_path: str = "./lancedb",
+    table_name: str = "documents",
+    filter_condition: Optional[str] = None
+) -> pd.DataFrame:
+    """Search for documents similar to an already embedded query.
+    
+    Args:
+        query_vector: Embedding of the query text
+        query_text: Text the vector was generated from, reported in results
+        k: Number of results to return
+        db_path: Path to LanceDB database
+        table_name: Name of the table to search
+        filter_condition: Optional SQL-like filter condition
+    
+    Returns:
+        DataFrame with search results including text, distance, and metadata
+    """
+    try:
+        search_engine = _get_search_engine(db_path, table_name)
+        
         # Perform vector search
-        search_query = search_engine.table.search(query_vector).limit(k)
+        search_query = search_engine.table.search(query_vector) \
+            .metric(DISTANCE_METRIC) \
+            .limit(k)
         
         # Apply filter if provided
         if filter_condition:
@@ -142,7 +315,9 @@ def search_similar(
         return results
         
     except Exception as e:
-        print(f"Error during search: {e}")
+        logger.error("Error during search: %s", e)
+        # Drop the cached handle; the table may have been dropped or recreated
+        _get_search_engine.cache_clear()
         raise
 
 
@@ -188,11 +363,19 @@ def batch_search(
         Dictionary mapping queries to their results
     """
     results = {}
-    for query in queries:
+    
+    # Embed every query in one batched forward pass
+    try:
+        query_vectors = _get_search_engine(db_path, "documents").generate_embeddings(queries)
+    except Exception as e:
+        logger.error("Error embedding queries: %s", e)
+        return {query: pd.DataFrame() for query in queries}
+    
+    for query, query_vector in zip(queries, query_vectors):
         try:
-            results[query] = search_similar(query, k=k, db_path=db_path)
+            results[query] = search_similar_by_vector(query_vector, query, k=k, db_path=db_path)
         except Exception as e:
-            print(f"Error searching for '{query}': {e}")
+            logger.error("Error searching for '%s': %s", query, e)
             results[query] = pd.DataFrame()
     
     return results
@@ -200,6 +383,9 @@ def batch_search(
 
 def main():
     """Main function demonstrating vector search capabilities."""
+    # Helpers log at debug level; surface their messages for the demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
     print("=" * 60)
     print("LanceDB Vector Similarity Search Demo")
     print("=" * 60)
@@ -213,9 +399,9 @@ def main():
     if not results.empty:
         print(f"\nQuery: '{query}'")
         print(f"Found {len(results)} results:\n")
-        for idx, row in results.iterrows():
-            print(f"{idx + 1}. {row['text']}")
-            print(f"   Distance: {row['_distance']:.4f}\n")
+        for idx, (text, distance) in enumerate(zip(results['text'], results['_distance'])):
+            print(f"{idx + 1}. {text}")
+            print(f"   Distance: {distance:.4f}\n")
     else:
         print("No results found")
     
@@ -228,8 +414,8 @@ def main():
     if not results.empty:
         print(f"\nQuery: '{query}'")
         print(f"Found {len(results)} results:\n")
-        for idx, row in results.iterrows():
-            print(f"{idx + 1}. {row['text']} (distance: {row['_distance']:.4f})")
+        for idx, (text, distance) in enumerate(zip(results['text'], results['_distance'])):
+            print(f"{idx + 1}. {text} (distance: {distance:.4f})")
     
     # Batch search
     print("\n3. Batch Search:")
@@ -246,8 +432,8 @@ def main():
         print(f"\nQuery: '{query}'")
         if not df.empty:
             print(f"Top {len(df)} results:")
-            for idx, row in df.iterrows():
-                print(f"  - {row['text']} (distance: {row['_distance']:.4f})")
+            for text, distance in zip(df['text'], df['_distance']):
+                print(f"  - {text} (distance: {distance:.4f})")
         else:
             print("  No results found")
     
@@ -260,10 +446,13 @@ def main():
     if not results.empty:
         print(f"\nQuery: '{query}' (filtered by category='AI/ML')")
         print(f"Found {len(results)} results:\n")
-        for idx, row in results.iterrows():
-            print(f"{idx + 1}. {row['text']}")
-            print(f"   Category: {row.get('category', 'N/A')}")
-            print(f"   Distance: {row['_distance']:.4f}\n")
+        categories = results['category'] if 'category' in results else ['N/A'] * len(results)
+        for idx, (text, category, distance) in enumerate(
+            zip(results['text'], categories, results['_distance'])
+        ):
+            print(f"{idx + 1}. {text}")
+            print(f"   Category: {category}")
+            print(f"   Distance: {distance:.4f}\n")
     
     print("=" * 60)
     print("Search demo completed!")
@@ -1,40 +1,80 @@
 # filepath: search.py
-"""Search with post-filtering."""
+"""Filtered vector search, contrasting prefiltering with post-filtering.
+
+The search functions prefilter, so they return k results whenever at least
+k rows match; only demonstrate_post_filtering post-filters, to show how
+filtering the top-k neighbours afterwards can return fewer than k results.
+"""
+
+import functools
 
 import lancedb
 import numpy as np
-import pandas as pd
+import pyarrow as pa
 from typing import List, Optional
 
+
+@functools.lru_cache(maxsize=8)
+def _get_table(uri: str, name: str):
+    """Open a table once per database and name, reusing the handle after.
+    
+    Call ``_get_table.cache_clear()`` after dropping or recreating a table.
+    """
+    return lancedb.connect(uri).open_table(name)
+
+
+# Below this many rows a brute-force scan beats building an ANN index
+ANN_INDEX_MIN_ROWS = 10_000
+
+# Vector searches re-rank refine factor x k PQ candidates with the full
+# float32 vectors to recover the recall lost to quantization; it has no
+# effect until the table has a vector index
+REFINE_FACTOR = 10
+
+
+def _create_indexes(table):
+    """Index the filter columns, and the vectors once the table is large enough.
+    
+    The low-cardinality category column gets a bitmap index and numeric
+    columns get B-trees, so prefilters resolve from the indexes instead of
+    scanning the columns.
+    """
+    table.create_scalar_index("category", index_type="BITMAP")
+    table.create_scalar_index("price", index_type="BTREE")
+    if table.count_rows() >= ANN_INDEX_MIN_ROWS:
+        table.create_index(
+            metric="l2",  # Matches the distance used by search()
+            num_partitions=256,
+            num_sub_vectors=16  # 128 dims / 16 = 8 dims per sub-vector
+        )
+
 def search_with_filter(query_vector: List[float], category: str, k: int = 10):
-    """Search with post-filtering on category.
+    """Search for the k nearest products in a category.
 
     Args:
         query_vector: Query vector for similarity search
         category: Category to filter by
-        k: Number of results to return before filtering
+        k: Number of results to return
     
     Returns:
         pandas.DataFrame: Filtered search results
     
     Note:
-        Post-filtering happens AFTER k results are selected from vector search.
-        This means if k=10 and only 3 results match the category filter,
-        you'll get 3 results (not 10).
+        The category filter is applied BEFORE the vector search, so distances
+        are only computed for matching rows and up to k matches are returned.
+        A post-filter would select the top-k first and could return as few as
+        3 results for k=10; see demonstrate_post_filtering.
     """
     try:
-        # Connect to the database
-        db = lancedb.connect("./my_lancedb")
-        
-        # Open the table
-        table = db.open_table("products")
+        # Reuse the open table handle
+        table = _get_table("./my_lancedb", "products")
         
-        # Perform vector search first, then apply post-filter
-        # The .where() clause is applied AFTER the top-k vector search results
+        # Prefilter on category so only matching rows are searched
         results = (
             table.search(query_vector)
+            .refine_factor(REFINE_FACTOR)
+            .where(f"category = '{category}'", prefilter=True)
             .limit(k)
-            .where(f"category = '{category}'")
             .to_pandas()
         )
         
@@ -50,16 +90,20 @@ def create_sample_data():
         # Connect to database
         db = lancedb.connect("./my_lancedb")
         
-        # Create sample data with vectors and categories
-        data = {
-            "id": list(range(1, 21)),
-            "name": [f"Product {i}" for i in range(1, 21)],
+        # Create sample data with vectors and categories, column by column;
+        # all vectors are drawn at once as one float32 matrix
+        num_products = 20
+        rng = np.random.default_rng()
+        vectors = rng.standard_normal((num_products, 128), dtype=np.float32)
+        data = pa.table({
+            "id": pa.array(range(1, num_products + 1), type=pa.int64()),
+            "name": [f"Product {i}" for i in range(1, num_products + 1)],
             "category": ["Electronics"] * 7 + ["Clothing"] * 7 + ["Books"] * 6,
-            "price": np.random.uniform(10, 500, 20).tolist(),
-            "vector": [np.random.randn(128).tolist() for _ in range(20)]
-        }
-        
-        df = pd.DataFrame(data)
+            "price": rng.uniform(10, 500, num_products),
+            "vector": pa.FixedSizeListArray.from_arrays(
+                pa.array(vectors.reshape(-1)), vectors.shape[1]
+            )
+        })
         
         # Create table (drop if exists)
         try:
@@ -67,8 +111,11 @@ def create_sample_data():
         except:
             pass
         
-        table = db.create_table("products", df)
-        print(f"Created table with {len(df)} products")
+        table = db.create_table("products", data)
+        _create_indexes(table)
+        # Handles to the dropped table are stale now
+        _get_table.cache_clear()
+        print(f"Created table with {data.num_rows} products")
         
         return table
     
@@ -79,8 +126,7 @@ def create_sample_data():
 def demonstrate_post_filtering():
     """Demonstrate the difference between pre-filtering and post-filtering."""
     try:
-        db = lancedb.connect("./my_lancedb")
-        table = db.open_table("products")
+        table = _get_table("./my_lancedb", "products")
         
         # Generate a random query vector
         query_vector = np.random.randn(128).tolist()
@@ -97,8 +143,9 @@ def demonstrate_post_filtering():
         
         results_post = (
             table.search(query_vector)
+            .refine_factor(REFINE_FACTOR)
             .limit(10)
-            .where("category = 'Electronics'")
+            .where("category = 'Electronics'", prefilter=False)
             .to_pandas()
         )
         
@@ -110,6 +157,7 @@ def demonstrate_post_filtering():
         print("\n2. Without filter (all top-10 results):")
         results_all = (
             table.search(query_vector)
+            .refine_factor(REFINE_FACTOR)
             .limit(10)
             .to_pandas()
         )
@@ -130,27 +178,30 @@ def demonstrate_post_filtering():
 def search_multiple_categories(query_vector: List[float], 
                                categories: List[str], 
                                k: int = 10):
-    """Search with post-filtering on multiple categories.
+    """Search for the k nearest products in any of several categories.
+    
+    The category filter is applied before the vector search, like
+    search_with_filter.
     
     Args:
         query_vector: Query vector for similarity search
         categories: List of categories to filter by
-        k: Number of results to return before filtering
+        k: Number of results to return
     
     Returns:
         pandas.DataFrame: Filtered search results
     """
     try:
-        db = lancedb.connect("./my_lancedb")
-        table = db.open_table("products")
+        table = _get_table("./my_lancedb", "products")
         
         # Build WHERE clause for multiple categories
         category_conditions = " OR ".join([f"category = '{cat}'" for cat in categories])
         
         results = (
             table.search(query_vector)
+            .refine_factor(REFINE_FACTOR)
+            .where(category_conditions, prefilter=True)
             .limit(k)
-            .where(category_conditions)
             .to_pandas()
         )
         
@@ -160,8 +211,45 @@ def search_multiple_categories(query_vector: List[float],
         print(f"Error during multi-category search: {e}")
         raise
 
+def search_batch(query_matrix, predicate: Optional[str] = None, k: int = 10):
+    """Search several query vectors with a single query plan.
+    
+    LanceDB runs all rows of the matrix through one search, so the table is
+    opened, the filter is planned and the data is scanned once instead of
+    once per query.
+    
+    Args:
+        query_matrix: Array of shape (N, 128), one query vector per row
+        predicate: Optional SQL filter, applied before the vector search
+        k: Number of results to return per query vector
+    
+    Returns:
+        pandas.DataFrame: Results for every query in one frame; the
+        query_index column gives the matrix row each result belongs to
+    """
+    try:
+        table = _get_table("./my_lancedb", "products")
+        
+        query = (
+            table.search(np.atleast_2d(np.asarray(query_matrix, dtype=np.float32)))
+            .refine_factor(REFINE_FACTOR)
+        )
+        if predicate:
+            query = query.where(predicate, prefilter=True)
+        results = query.limit(k).to_pandas()
+        
+        # A single-row matrix is searched as a plain query without query_index
+        if "query_index" not in results.columns:
+            results.insert(0, "query_index", 0)
+        
+        return results
+    
+    except Exception as e:
+        print(f"Error during batch search: {e}")
+        raise
+
 def main():
-    """Main function to demonstrate search with post-filtering."""
+    """Main function to demonstrate prefiltered and post-filtered search."""
     try:
         # Create sample data
         print("Creating sample data...")
@@ -204,16 +292,29 @@ def main():
         if len(multi_results) > 0:
             print(multi_results[["id", "name", "category", "price", "_distance"]])
         
+        # Example: Several query vectors in one search
+        print("\n" + "="*60)
+        print("BATCH SEARCH")
+        print("="*60)
+        
+        query_matrix = np.random.default_rng().standard_normal((3, 128), dtype=np.float32)
+        
+        print("\nSearching Clothing for 3 query vectors at once...")
+        batch_results = search_batch(query_matrix, "category = 'Clothing'", k=3)
+        
+        print(f"\nFound {len(batch_results)} products:")
+        print(batch_results[["query_index", "id", "name", "category", "_distance"]])
+        
         print("\n" + "="*60)
-        print("Post-filter search complete")
+        print("Filtered search complete")
         print("="*60)
         
         # Important notes
         print("\nIMPORTANT NOTES:")
-        print("- Post-filtering applies AFTER vector search selects top-k results")
-        print("- If k=10 but only 3 match the filter, you get 3 results")
-        print("- For guaranteed k results, use pre-filtering or increase k")
-        print("- Post-filtering is faster but may return fewer results")
+        print("- The category searches above prefilter, so they return k results")
+        print("  whenever at least k rows match the filter")
+        print("- Only the post-filtering demonstration filters AFTER vector search")
+        print("  selects the top-k results; if k=10 but only 3 match, you get 3 results")
         
     except Exception as e:
         print(f"Error in main: {e}")
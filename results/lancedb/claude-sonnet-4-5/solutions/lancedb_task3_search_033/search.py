@@ -1,10 +1,68 @@
 # filepath: search.py
 """Search with prefiltering (more efficient)."""
 
+import functools
+import math
+import time
+
 import lancedb
 import numpy as np
 import pandas as pd
-from typing import Optional
+import pyarrow as pa
+from typing import Dict, Optional, Tuple
+
+
+# Selectivity above which a plain search with an over-fetched post-filter
+# is cheaper than prefiltering
+POSTFILTER_MIN_SELECTIVITY = 0.5
+
+# How long a predicate's match count is reused before it is recounted
+SELECTIVITY_TTL_SECONDS = 5.0
+
+# predicate -> (time counted, matching rows, total rows)
+_selectivity_cache: Dict[str, Tuple[float, int, int]] = {}
+
+
+@functools.lru_cache(maxsize=8)
+def _get_table(uri: str, name: str):
+    """Open a table once per database and name, reusing the handle after.
+    
+    Call ``_get_table.cache_clear()`` after dropping or recreating a table.
+    """
+    return lancedb.connect(uri).open_table(name)
+
+
+# Below this many rows a brute-force scan beats building an ANN index
+ANN_INDEX_MIN_ROWS = 10_000
+
+# Vector searches re-rank refine factor x k PQ candidates with the full
+# float32 vectors to recover the recall lost to quantization; it has no
+# effect until the table has a vector index
+REFINE_FACTOR = 10
+
+
+def _create_indexes(table):
+    """Index the filter columns, and the vectors once the table is large enough.
+    
+    The low-cardinality category column gets a bitmap index and numeric
+    columns get B-trees, so prefilters resolve from the indexes instead of
+    scanning the columns.
+    """
+    table.create_scalar_index("category", index_type="BITMAP")
+    table.create_scalar_index("price", index_type="BTREE")
+    table.create_scalar_index("rating", index_type="BTREE")
+    if table.count_rows() >= ANN_INDEX_MIN_ROWS:
+        table.create_index(
+            metric="l2",  # Matches the distance used by search()
+            num_partitions=256,
+            num_sub_vectors=16  # 128 dims / 16 = 8 dims per sub-vector
+        )
+
+
+def _category_filter(category: str) -> str:
+    """Build a category equality predicate, escaping quotes in the literal."""
+    escaped = category.replace("'", "''")
+    return f"category = '{escaped}'"
 
 
 def search_with_prefilter(query_vector, category: str, k: int = 10):
@@ -22,27 +80,29 @@ def search_with_prefilter(query_vector, category: str, k: int = 10):
     computing vector distances, making the search much more efficient
     for large datasets.
     """
+    # Only a missing table falls back to sample data; query errors such as
+    # a wrong vector size must propagate instead of replacing the table.
+    # Newer LanceDB releases raise ValueError for a missing table.
+    try:
+        # Reuse the open table handle
+        table = _get_table("./lancedb_data", "products")
+    except (FileNotFoundError, ValueError):
+        print("Error: Database or table not found. Creating sample data...")
+        return create_sample_data_and_search(query_vector, category, k)
+
     try:
-        # Connect to the database
-        db = lancedb.connect("./lancedb_data")
-        
-        # Open the table (assumes it exists)
-        table = db.open_table("products")
-        
         # Perform search with prefiltering
         # The prefilter=True ensures filtering happens BEFORE distance computation
         results = (
             table.search(query_vector)
-            .where(f"category = '{category}'", prefilter=True)
+            .refine_factor(REFINE_FACTOR)
+            .where(_category_filter(category), prefilter=True)
             .limit(k)
             .to_pandas()
         )
         
         return results
     
-    except FileNotFoundError:
-        print("Error: Database or table not found. Creating sample data...")
-        return create_sample_data_and_search(query_vector, category, k)
     except Exception as e:
         print(f"Error during search: {e}")
         raise
@@ -54,30 +114,38 @@ def create_sample_data_and_search(query_vector, category: str, k: int = 10):
         # Connect to database
         db = lancedb.connect("./lancedb_data")
         
-        # Create sample data with vectors and categories
-        data = []
+        # Create sample data with vectors and categories, column by column;
+        # all vectors are drawn at once as one float32 matrix
+        num_products = 100
         categories = ["electronics", "clothing", "books", "toys"]
-        
-        for i in range(100):
-            data.append({
-                "id": i,
-                "vector": np.random.randn(128).tolist(),  # 128-dim vectors
-                "category": categories[i % len(categories)],
-                "name": f"Product {i}",
-                "price": np.random.uniform(10, 1000),
-                "rating": np.random.uniform(1, 5)
-            })
+        rng = np.random.default_rng()
+        vectors = rng.standard_normal((num_products, 128), dtype=np.float32)  # 128-dim vectors
+        data = pa.table({
+            "id": pa.array(range(num_products), type=pa.int64()),
+            "vector": pa.FixedSizeListArray.from_arrays(
+                pa.array(vectors.reshape(-1)), vectors.shape[1]
+            ),
+            "category": [categories[i % len(categories)] for i in range(num_products)],
+            "name": [f"Product {i}" for i in range(num_products)],
+            "price": rng.uniform(10, 1000, num_products),
+            "rating": rng.uniform(1, 5, num_products)
+        })
         
         # Create table
         table = db.create_table("products", data, mode="overwrite")
+        _create_indexes(table)
+        # Handles and match counts for the replaced table are stale now
+        _get_table.cache_clear()
+        _selectivity_cache.clear()
         
-        print(f"Created sample table with {len(data)} products")
+        print(f"Created sample table with {data.num_rows} products")
         print(f"Categories: {categories}")
         
         # Perform search with prefiltering
         results = (
             table.search(query_vector)
-            .where(f"category = '{category}'", prefilter=True)
+            .refine_factor(REFINE_FACTOR)
+            .where(_category_filter(category), prefilter=True)
             .limit(k)
             .to_pandas()
         )
@@ -109,11 +177,10 @@ def search_with_multiple_filters(
         pandas.DataFrame: Filtered search results
     """
     try:
-        db = lancedb.connect("./lancedb_data")
-        table = db.open_table("products")
+        table = _get_table("./lancedb_data", "products")
         
         # Build filter string with multiple conditions
-        filters = [f"category = '{category}'"]
+        filters = [_category_filter(category)]
         
         if min_price is not None:
             filters.append(f"price >= {min_price}")
@@ -126,6 +193,7 @@ def search_with_multiple_filters(
         # Perform search with combined prefilters
         results = (
             table.search(query_vector)
+            .refine_factor(REFINE_FACTOR)
             .where(filter_string, prefilter=True)
             .limit(k)
             .to_pandas()
@@ -138,6 +206,82 @@ def search_with_multiple_filters(
         raise
 
 
+def _estimate_selectivity(table, predicate: str) -> Tuple[int, int]:
+    """Count rows matching a predicate, reusing recent counts.
+    
+    Returns:
+        Tuple of (matching rows, total rows)
+    """
+    now = time.monotonic()
+    cached = _selectivity_cache.get(predicate)
+    if cached is not None and now - cached[0] < SELECTIVITY_TTL_SECONDS:
+        return cached[1], cached[2]
+    
+    n_matched = table.count_rows(filter=predicate)
+    n_total = table.count_rows()
+    _selectivity_cache[predicate] = (now, n_matched, n_total)
+    return n_matched, n_total
+
+
+def search_adaptive(query_vector, predicate: str, k: int = 10):
+    """Search with a filter, choosing the filter strategy from its selectivity.
+    
+    - Fewer than k matching rows: exact search over just those rows,
+      bypassing any vector index.
+    - Most rows match: plain search over-fetching k / selectivity rows,
+      post-filtered and trimmed to k.
+    - Otherwise: prefiltered search.
+    
+    Args:
+        query_vector: Query vector for similarity search
+        predicate: SQL filter condition
+        k: Number of results to return
+    
+    Returns:
+        pandas.DataFrame: Up to k nearest rows matching the predicate
+    """
+    try:
+        table = _get_table("./lancedb_data", "products")
+        
+        n_matched, n_total = _estimate_selectivity(table, predicate)
+        selectivity = n_matched / n_total if n_total else 0.0
+        
+        if n_matched < k:
+            # So few candidates that scoring all of them exactly is cheapest
+            return (
+                table.search(query_vector)
+                .where(predicate, prefilter=True)
+                .bypass_vector_index()
+                .limit(k)
+                .to_pandas()
+            )
+        
+        if selectivity > POSTFILTER_MIN_SELECTIVITY:
+            # Over-fetch so about k rows survive the filter
+            results = (
+                table.search(query_vector)
+                .refine_factor(REFINE_FACTOR)
+                .where(predicate, prefilter=False)
+                .limit(math.ceil(k / selectivity))
+                .to_pandas()
+            )
+            if len(results) >= k:
+                return results.head(k)
+            # Too few survived; fall through to an exact prefiltered search
+        
+        return (
+            table.search(query_vector)
+            .refine_factor(REFINE_FACTOR)
+            .where(predicate, prefilter=True)
+            .limit(k)
+            .to_pandas()
+        )
+    
+    except Exception as e:
+        print(f"Error during adaptive search: {e}")
+        raise
+
+
 def compare_prefilter_vs_postfilter(query_vector, category: str, k: int = 10):
     """Demonstrate the difference between prefilter and postfilter.
     
@@ -145,14 +289,14 @@ def compare_prefilter_vs_postfilter(query_vector, category: str, k: int = 10):
     Postfilter (prefilter=False): Computes all distances, then filters - SLOWER
     """
     try:
-        db = lancedb.connect("./lancedb_data")
-        table = db.open_table("products")
+        table = _get_table("./lancedb_data", "products")
         
         print("\n=== Prefilter Search (Efficient) ===")
         # Prefilter: Filter BEFORE distance computation
         prefilter_results = (
             table.search(query_vector)
-            .where(f"category = '{category}'", prefilter=True)
+            .refine_factor(REFINE_FACTOR)
+            .where(_category_filter(category), prefilter=True)
             .limit(k)
             .to_pandas()
         )
@@ -162,7 +306,8 @@ def compare_prefilter_vs_postfilter(query_vector, category: str, k: int = 10):
         # Postfilter: Compute distances first, then filter
         postfilter_results = (
             table.search(query_vector)
-            .where(f"category = '{category}'", prefilter=False)
+            .refine_factor(REFINE_FACTOR)
+            .where(_category_filter(category), prefilter=False)
             .limit(k)
             .to_pandas()
         )
@@ -211,6 +356,13 @@ def main():
         k=3
     )
     
+    # Example 4: Let the filter's selectivity pick the strategy
+    print("\n\n4. Adaptive Filter Strategy")
+    print("-" * 50)
+    adaptive_results = search_adaptive(query_vector, "category = 'toys'", k=5)
+    print("\nTop 5 toys (strategy chosen from filter selectivity):")
+    print(adaptive_results[["id", "name", "category", "price", "rating"]].to_string())
+    
     print("\n=== Summary ===")
     print(f"✓ Prefilter search: Filters BEFORE distance computation (faster)")
     print(f"✓ Use prefilter=True for better performance on large datasets")